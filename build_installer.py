@@ -1,12 +1,27 @@
 """
 Build script for Microsoft Backup Suite installers
 Creates standalone Windows executables using PyInstaller
+
+Environment variables:
+    BUILD_ONEFILE=1   Build single-file .exe files instead of the default
+                      one-folder builds (slower to start on every launch)
+    FULL_REBUILD=1    Discard PyInstaller's cache and previous output and
+                      rebuild from scratch (use this for release builds)
+    DEV_BUILD=1       Faster local PyInstaller builds using --noarchive
+                      (ignored with BUILD_ONEFILE=1)
+    UPX_DIR=path      Folder containing upx.exe, used by PyInstaller to
+                      compress bundled binaries (upx on PATH is also used)
+    BUILDER=name      Bundler to use: pyinstaller (default), nuitka or
+                      cx_freeze. Nuitka builds start fastest but take
+                      longer to compile.
 """
 
+import gzip
 import subprocess
 import sys
 import os
-import shutil
+import tempfile
+import threading
 from pathlib import Path
 
 # Fix console encoding for Windows
@@ -14,99 +29,261 @@ if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
     sys.stderr.reconfigure(encoding='utf-8', errors='replace')
 
-def build_executable(script_path, name, icon=None):
-    """Build a single executable"""
-    print(f"\n{'='*60}")
-    print(f"Building {name}...")
-    print(f"{'='*60}")
+BUILDERS = ("pyinstaller", "nuitka", "cx_freeze")
+BYTES_PER_MB = 1048576
+
+# DLLs that break or trigger antivirus false positives when UPX-packed
+UPX_EXCLUDES = ["vcruntime140.dll", "vcruntime140_1.dll"]
+
+# Stdlib/tooling modules neither CLI tool imports - keeps the bundles small
+EXCLUDED_MODULES = ["tkinter", "unittest", "pydoc", "test", "setuptools",
+                    "pip", "lib2to3", "xmlrpc"]
+
+def _get_builder():
+    """Bundler selected via BUILDER (defaults to PyInstaller)"""
+    builder = os.environ.get("BUILDER", "pyinstaller").lower()
+    if builder not in BUILDERS:
+        print(f"⚠️ Unknown BUILDER '{builder}', using pyinstaller")
+        builder = "pyinstaller"
+    return builder
+
+def _is_single_file(builder):
+    """Whether the builder produces a lone .exe rather than a folder"""
+    if builder == "nuitka":
+        return True
+    if builder == "cx_freeze":
+        return False
+    return os.environ.get("BUILD_ONEFILE") == "1"
+
+def _make_cmd(builder, script_path, name, icon=None, dist_dir=None, work_dir=None):
+    """Build the bundler command line for one executable"""
+    if icon and not Path(icon).exists():
+        icon = None
+    
+    if builder == "nuitka":
+        # Compiled to C - no runtime unpack of Python modules at launch
+        cmd = [
+            sys.executable, "-m", "nuitka",
+            "--onefile",
+            "--standalone",
+            "--assume-yes-for-downloads",
+            "--remove-output",
+            f"--output-filename={name}.exe",
+        ]
+        cmd += [f"--nofollow-import-to={m}" for m in EXCLUDED_MODULES]
+        if dist_dir:
+            cmd.append(f"--output-dir={dist_dir}")
+        if icon:
+            cmd.append(f"--windows-icon-from-ico={icon}")
+        cmd.append(str(script_path))
+        return cmd
+    
+    if builder == "cx_freeze":
+        cmd = [
+            "cxfreeze",
+            f"--script={script_path}",
+            f"--target-name={name}",
+        ]
+        if dist_dir:
+            cmd.append(f"--target-dir={Path(dist_dir) / name}")
+        if icon:
+            cmd.append(f"--icon={icon}")
+        return cmd
+    
+    # --onedir avoids the per-launch self-extraction of --onefile builds
+    onefile = _is_single_file(builder)
+    full_rebuild = os.environ.get("FULL_REBUILD") == "1"
     
     cmd = [
         sys.executable, "-m", "PyInstaller",
-        "--onefile",
+        "--onefile" if onefile else "--onedir",
         "--console",
         f"--name={name}",
-        "--clean",
+        "--noconfirm",
         str(script_path)
     ]
     
-    if icon and Path(icon).exists():
+    cmd[-1:-1] = [f"--exclude-module={m}" for m in EXCLUDED_MODULES]
+    
+    # Write the output straight into the combined dist folder
+    if dist_dir:
+        cmd.insert(-1, f"--distpath={dist_dir}")
+    
+    # UPX shrinks the bundled binaries; PyInstaller caches the packed DLLs in its bincache
+    # under PYINSTALLER_CONFIG_DIR (per executable, see build_executable), not the work dir
+    upx_dir = os.environ.get("UPX_DIR")
+    if upx_dir:
+        cmd.insert(-1, f"--upx-dir={upx_dir}")
+    cmd[-1:-1] = [f"--upx-exclude={dll}" for dll in UPX_EXCLUDES]
+    
+    # Persistent work dir keeps each build's analysis cache between runs of that same build
+    # (each spec gets its own subfolder, so the two builds don't share anything here)
+    if work_dir:
+        cmd[-1:-1] = [f"--workpath={work_dir}", f"--specpath={work_dir}"]
+    
+    # Dev builds skip packing modules into the PYZ archive (one-folder builds only)
+    if os.environ.get("DEV_BUILD") == "1" and not onefile:
+        cmd.insert(-1, "--noarchive")
+    
+    # Keep PyInstaller's cache between runs unless a full rebuild is requested
+    if full_rebuild:
+        cmd.insert(-1, "--clean")
+    
+    if icon:
         cmd.insert(4, f"--icon={icon}")
     
-    result = subprocess.run(cmd, cwd=script_path.parent)
+    return cmd
+
+def _drain_output(proc, log_path):
+    """Copy a build's combined stdout/stderr into its gzip-compressed log file"""
+    import shutil
+    
+    with gzip.open(log_path, 'wb') as log:
+        shutil.copyfileobj(proc.stdout, log)
+    proc.stdout.close()
+
+def build_executable(script_path, name, icon=None, work_dir=None, dist_dir=None):
+    """
+    Start building a single executable.
+    
+    Build output is written to build-<name>.log.gz in the work directory.
     
-    if result.returncode == 0:
+    Returns:
+        tuple: (process, log_path, reader_thread) for wait_for_build
+    """
+    print(f"\n{'='*60}")
+    print(f"Building {name}...")
+    print(f"{'='*60}")
+    
+    cmd = _make_cmd(_get_builder(), script_path, name, icon, dist_dir, work_dir)
+    
+    # Separate config dir per build so parallel builds don't share a cache
+    env = dict(os.environ)
+    env["PYINSTALLER_CONFIG_DIR"] = str(Path(tempfile.gettempdir()) / f"pyi-{name}")
+    
+    log_dir = Path(work_dir) if work_dir else script_path.parent
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_path = log_dir / f"build-{name}.log.gz"
+    
+    proc = subprocess.Popen(cmd, cwd=script_path.parent, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    reader = threading.Thread(target=_drain_output, args=(proc, log_path), daemon=True)
+    reader.start()
+    print(f"📝 Logging to {log_path}")
+    
+    return proc, log_path, reader
+
+def wait_for_build(build, name):
+    """Wait for a build started by build_executable to finish"""
+    proc, log_path, reader = build
+    rc = proc.wait()
+    reader.join()
+    
+    if rc == 0:
         print(f"✅ Successfully built {name}")
         return True
     else:
-        print(f"❌ Failed to build {name}")
+        print(f"❌ Failed to build {name} (see {log_path})")
+        with gzip.open(log_path, 'rt', encoding='utf-8', errors='replace') as log:
+            for line in log.readlines()[-20:]:
+                print(f"   {line.rstrip()}")
         return False
 
-def main():
-    base_dir = Path(__file__).parent
+def _needs_rebuild(script_dir, exe_path):
+    """True if any source under script_dir is newer than the built executable"""
+    if not exe_path.exists():
+        return True
+    newest = max((p.stat().st_mtime for p in script_dir.rglob('*.py')), default=0)
+    return newest > exe_path.stat().st_mtime
+
+def _tree_size(path):
+    """Total size of all files under a directory, using scandir's cached stat"""
+    total = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                total += _tree_size(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+def main(verbose=True):
+    import shutil
+    
+    # Absolute so script paths stay valid when each build runs with its own cwd
+    base_dir = Path(__file__).resolve().parent
+    work_dir = base_dir / "build-cache"
     dist_dir = base_dir / "dist"
     
-    # Clean up old builds
-    for cleanup_dir in ["build", "__pycache__"]:
-        cleanup_path = base_dir / cleanup_dir
-        if cleanup_path.exists():
-            shutil.rmtree(cleanup_path)
+    # Clean up old builds (only for full rebuilds - the build cache is reused otherwise)
+    # build-cache is left alone here; --clean resets it during a full rebuild
+    if os.environ.get("FULL_REBUILD") == "1":
+        for cleanup_dir in ["build", "__pycache__", "dist"]:
+            shutil.rmtree(base_dir / cleanup_dir, ignore_errors=True)
     
-    print("="*60)
-    print("Microsoft Backup Suite - Installer Builder")
-    print("="*60)
-    print(f"Python: {sys.version}")
-    print(f"Base directory: {base_dir}")
+    if verbose:
+        print("="*60)
+        print("Microsoft Backup Suite - Installer Builder")
+        print("="*60)
+        print(f"Python: {sys.version}")
+        print(f"Base directory: {base_dir}")
     
-    # Build OneDrive Backup
-    onedrive_script = base_dir / "onedrive-backup" / "onedrive_backup_enhanced.py"
-    if onedrive_script.exists():
-        # Change to the script's directory for the build
-        os.chdir(onedrive_script.parent)
-        success1 = build_executable(onedrive_script, "OneDrive-Backup")
-        os.chdir(base_dir)
-    else:
-        print(f"⚠️ OneDrive script not found: {onedrive_script}")
-        success1 = False
+    # Create the dist folder all builds write into
+    dist_dir.mkdir(parents=True, exist_ok=True)
     
-    # Build OneNote Exporter
+    # Build OneDrive Backup and OneNote Exporter in parallel
+    onedrive_script = base_dir / "onedrive-backup" / "onedrive_backup_enhanced.py"
     onenote_script = base_dir / "onenote-exporter" / "onenote_exporter.py"
-    if onenote_script.exists():
-        os.chdir(onenote_script.parent)
-        success2 = build_executable(onenote_script, "OneNote-Exporter")
-        os.chdir(base_dir)
-    else:
-        print(f"⚠️ OneNote script not found: {onenote_script}")
-        success2 = False
     
-    # Create combined dist folder
-    combined_dist = base_dir / "dist"
-    combined_dist.mkdir(exist_ok=True)
+    # Byte-compile both projects up front using all cores; the builds reuse the .pyc files
+    subprocess.run([sys.executable, "-m", "compileall", "-j", "0", "-q",
+                    str(onedrive_script.parent), str(onenote_script.parent)])
     
-    # Copy executables to main dist folder
+    single_file = _is_single_file(_get_builder())
+    
+    builds = []
+    for script, name in [(onedrive_script, "OneDrive-Backup"),
+                         (onenote_script, "OneNote-Exporter")]:
+        exe_path = dist_dir / f"{name}.exe" if single_file else dist_dir / name / f"{name}.exe"
+        if not script.exists():
+            print(f"⚠️ Script not found: {script}")
+        elif not _needs_rebuild(script.parent, exe_path):
+            print(f"✅ {name} is up-to-date, skipping")
+        else:
+            builds.append((name, build_executable(script, name, work_dir=work_dir,
+                                                  dist_dir=dist_dir)))
+    
+    # An older exe may still be in dist, so a failed build has to be reported from its result
+    failed_builds = [(name, build[1]) for name, build in builds if not wait_for_build(build, name)]
+    
+    # Executables were built directly into the dist folder
     print(f"\n{'='*60}")
     print("Collecting executables...")
     print(f"{'='*60}")
     
-    executables_found = []
+    executables_found = []  # (name, size) tuples
+    names = ["OneDrive-Backup", "OneNote-Exporter"]
+    expected = {(f"{name}.exe" if single_file else name): name for name in names}
     
-    onedrive_exe = base_dir / "onedrive-backup" / "dist" / "OneDrive-Backup.exe"
-    if onedrive_exe.exists():
-        dest = combined_dist / "OneDrive-Backup.exe"
-        shutil.copy2(onedrive_exe, dest)
-        executables_found.append(dest)
-        print(f"✅ Copied: {dest}")
-    
-    onenote_exe = base_dir / "onenote-exporter" / "dist" / "OneNote-Exporter.exe"
-    if onenote_exe.exists():
-        dest = combined_dist / "OneNote-Exporter.exe"
-        shutil.copy2(onenote_exe, dest)
-        executables_found.append(dest)
-        print(f"✅ Copied: {dest}")
+    # One directory scan collects names and sizes for the summary
+    with os.scandir(dist_dir) as it:
+        for entry in it:
+            name = expected.get(entry.name)
+            if name is None:
+                continue
+            if single_file:
+                size = entry.stat().st_size
+            elif os.path.exists(os.path.join(entry.path, f"{name}.exe")):
+                size = _tree_size(entry.path)
+            else:
+                continue
+            executables_found.append((entry.name, size))
+            print(f"✅ Found: {entry.path}")
     
     # Copy settings.json if it exists in root
     settings_file = base_dir / "settings.json"
     if settings_file.exists():
-        dest = combined_dist / "settings.json"
+        dest = dist_dir / "settings.json"
         shutil.copy2(settings_file, dest)
         print(f"✅ Copied: {dest} (credentials)")
     else:
@@ -114,22 +291,31 @@ def main():
     
     # Summary
     print(f"\n{'='*60}")
-    print("BUILD COMPLETE!")
+    print("BUILD FAILED!" if failed_builds else "BUILD COMPLETE!")
     print(f"{'='*60}")
     
+    if failed_builds:
+        print("\n❌ These builds failed (any executable left in dist is from an earlier build):")
+        for name, log_path in failed_builds:
+            print(f"  • {name} (see {log_path})")
+    
     if executables_found:
-        print(f"\n📁 Executables are in: {combined_dist}")
+        print(f"\n📁 Executables are in: {dist_dir}")
         print("\nFiles created:")
-        for exe in executables_found:
-            size_mb = exe.stat().st_size / (1024 * 1024)
-            print(f"  • {exe.name} ({size_mb:.1f} MB)")
+        for exe_name, size in executables_found:
+            print(f"  • {exe_name} ({size / BYTES_PER_MB:.1f} MB)")
         
-        print("\n🎉 You can now distribute these .exe files!")
-        print("   Users don't need Python installed to run them.")
+        # Stale executables from an earlier build aren't advertised as ready to ship
+        if not failed_builds:
+            if single_file:
+                print("\n🎉 You can now distribute these .exe files!")
+            else:
+                print("\n🎉 You can now distribute these folders (keep each .exe next to its files)!")
+            print("   Users don't need Python installed to run them.")
     else:
         print("\n❌ No executables were created. Check the errors above.")
     
-    return 0 if executables_found else 1
+    return 0 if executables_found and not failed_builds else 1
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -3,35 +3,665 @@ import shutil
 from pathlib import Path
 from datetime import datetime
 import json
+import re
 import getpass
 import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+from urllib3.util.retry import Retry
 import webbrowser
 from urllib.parse import urljoin, urlparse, parse_qs
 import time
+import random
 import hashlib
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import base64
+import functools
+import errno
+import mmap
+import multiprocessing
+import sys
+import argparse
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED, FIRST_EXCEPTION
 from threading import Lock
 import threading
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+try:
+    import orjson  # Optional: much faster metadata save/load
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # Optional: count entries in large progress files without loading them
+except ImportError:
+    ijson = None
+
+try:
+    import msal  # Optional: official Microsoft device code flow with token refresh
+except ImportError:
+    msal = None
+
+try:
+    import xxhash  # Optional: much faster local integrity hashing
+except ImportError:
+    xxhash = None
+
+try:
+    import blake3  # Optional: fast cryptographic alternative to SHA256
+except ImportError:
+    blake3 = None
+
+HASH_ALGOS = ("sha256", "xxh3", "blake3")
+
+# File types each backup category includes
+DOC_EXTENSIONS = frozenset({'.pdf', '.docx', '.doc', '.txt', '.xlsx', '.xls',
+                            '.pptx', '.ppt', '.odt', '.rtf', '.csv'})
+PIC_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff',
+                            '.svg', '.webp', '.heic', '.raw'})
+VIDEO_EXTENSIONS = frozenset({'.mov', '.mp4', '.avi', '.mkv', '.wmv', '.flv',
+                              '.m4v', '.mpg', '.mpeg', '.3gp', '.webm'})
+
+# msal adds offline_access (refresh token) itself and rejects it in the scope list
+MSAL_SCOPES = ["https://graph.microsoft.com/Files.Read.All"]
+
+# Microsoft Graph calls go through their own connection pool with automatic retries
+GRAPH_API_PREFIX = "https://graph.microsoft.com/"
+GRAPH_API_ROOT = GRAPH_API_PREFIX + "v1.0"
+
+# Folder listings are fetched in JSON batches of up to this many requests (Graph's limit)
+GRAPH_BATCH_URL = GRAPH_API_ROOT + "/$batch"
+GRAPH_BATCH_SIZE = 20
+
+# Folder listing batches fetched at once; kept small to stay clear of Graph throttling
+SCAN_BATCH_WORKERS = 4
+GRAPH_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Downloads are network-bound; many in-flight requests keep the link busy for small files
+DEFAULT_DOWNLOAD_WORKERS = 16
+
+# Local-folder backups copy this many files at once; modest so external HDDs aren't thrashed
+DEFAULT_COPY_WORKERS = 8
+
+# Seconds a local copy's mtime may differ from its source's and still count as unchanged
+# (FAT32 backup drives round timestamps to 2 seconds)
+MTIME_TOLERANCE = 2
+
+# Failed local copies listed in the backup summary (the rest are only in backup_log.jsonl)
+FAILED_FILES_SHOWN = 10
+
+# Fraction of local copies whose contents are hash-verified (all are size-checked)
+VERIFY_SAMPLE_RATE = 0.01
+
+# Local copies at least this big are always hash-verified
+DEEP_VERIFY_MIN_SIZE = 1024 * 1024 * 1024  # 1 GB
+
+# Local copies at least this big get their space reserved before writing
+PREALLOCATE_MIN_SIZE = 1024 * 1024
+
+# Filesystems that reserve space for posix_fallocate natively. On others (FAT/exFAT
+# USB drives, FUSE, network mounts) glibc emulates it by writing zeros over the file
+NATIVE_FALLOCATE_FILESYSTEMS = frozenset({'ext4', 'xfs', 'btrfs', 'f2fs', 'tmpfs'})
+
+# Local copies at least this big get kernel readahead hints and leave no source pages cached
+READAHEAD_MIN_SIZE = 16 * 1024 * 1024
+
+# (connect, read) timeouts for streamed downloads: fail fast on unreachable hosts,
+# but let a slow transfer stall for a while before giving up
+DOWNLOAD_TIMEOUT = (10, 300)
+
+# ProcessPoolExecutor refuses more than 61 workers on Windows
+MAX_PROCESS_WORKERS = 61
+
+# Small files are sent to the hash pool in batches to amortise per-task IPC
+HASH_BATCH_FILES = 64
+HASH_BATCH_BYTES = 64 * 1024 * 1024
+
+# Files above this size are fetched as several parallel byte ranges; a few ranges are
+# enough to fill a long-latency link without crowding out the other workers' connections
+SEGMENTED_DOWNLOAD_THRESHOLD = 512 * 1024 * 1024  # 512 MB
+DOWNLOAD_SEGMENTS = 4
+
+# Stack size for download worker threads (the OS default reserves 1-8 MB each)
+DOWNLOAD_THREAD_STACK_SIZE = 512 * 1024
+
+# Seconds of download throughput the worker limit is tuned on (see DownloadLimiter)
+WORKER_TUNE_INTERVAL = 10
+
+# Responses that mean the server wants fewer concurrent requests
+THROTTLE_STATUSES = (429, 503)
+
+# Only the drive item fields scanning and downloading use; Graph omits the rest of each item
+DRIVE_ITEM_FIELDS = "id,name,size,folder,file,@microsoft.graph.downloadUrl"
+
+# Items asked for per folder listing page; Graph caps it lower where it must, so
+# this only ever saves @odata.nextLink round trips
+DRIVE_PAGE_SIZE = 999
+CHILDREN_QUERY = f"$select={DRIVE_ITEM_FIELDS}&$top={DRIVE_PAGE_SIZE}"
+
+# Journal entries appended before save_metadata rewrites the full snapshot
+METADATA_COMPACT_EVERY = 5000
+
+# Seconds between status line updates while scanning the local OneDrive folder
+SCAN_REPORT_INTERVAL = 0.1
+
+# Seconds between background progress saves while downloading
+PROGRESS_SAVE_INTERVAL = 5
+
+# Seconds between full rewrites of .progress.json on the (often slow) backup drive;
+# saves in between only append to the metadata journal
+PROGRESS_SNAPSHOT_INTERVAL = 60
+
+# Progress/metadata files above this size are counted with ijson (if installed)
+STREAM_COUNT_MIN_SIZE = 1024 * 1024
+
+def json_dumps(obj):
+    """Serialize to compact JSON bytes (orjson if installed)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+def json_loads(data):
+    """Parse JSON from bytes or str (orjson if installed)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def count_json_entries(file_path, key):
+    """Number of entries in the top-level object `key` of a JSON file"""
+    if ijson is not None and os.path.getsize(file_path) >= STREAM_COUNT_MIN_SIZE:
+        with open(file_path, 'rb') as f:
+            return sum(1 for _ in ijson.kvitems(f, key))
+    with open(file_path, 'rb') as f:
+        return len(json_loads(f.read()).get(key, {}))
+
+def _pipelined_update(hasher, f, chunk_size):
+    """Feed a file to hasher while a reader thread fetches the next chunks"""
+    chunks = queue.Queue(maxsize=4)
+    
+    def reader():
+        try:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                chunks.put(chunk)
+            chunks.put(None)
+        except Exception as e:
+            chunks.put(e)
+    
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    # hashlib releases the GIL for large buffers, so reading and hashing overlap
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            break
+        if isinstance(chunk, Exception):
+            raise chunk
+        hasher.update(chunk)
+    thread.join()
+
+def new_hasher(algorithm='sha256'):
+    """Create a hash object for sha256/xxh3/blake3 or any hashlib algorithm"""
+    if algorithm == 'xxh3':
+        return xxhash.xxh3_64()
+    if algorithm == 'blake3':
+        return blake3.blake3()
+    return hashlib.new(algorithm)
+
+def cpu_has_sha_extensions():
+    """True if the CPU has SHA256 instructions (x86 SHA-NI / ARMv8 SHA2)"""
+    try:
+        import cpufeature  # Optional
+        return bool(cpufeature.CPUFeature.get('SHA'))
+    except ImportError:
+        pass
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith(('flags', 'Features')):
+                    flags = line.split(':', 1)[1].split()
+                    return 'sha_ni' in flags or 'sha2' in flags
+    except OSError:
+        pass
+    return False  # Unknown (e.g. Windows without cpufeature)
+
+def resolve_hash_algo(requested='auto'):
+    """
+    Pick the local integrity hash.
+    
+    'auto' keeps SHA256 when the CPU accelerates it, otherwise uses the
+    fastest installed alternative.
+    """
+    available = {'sha256': True, 'xxh3': xxhash is not None, 'blake3': blake3 is not None}
+    if requested == 'auto':
+        if cpu_has_sha_extensions():
+            return 'sha256'
+        for algo in ('xxh3', 'blake3'):
+            if available[algo]:
+                return algo
+        return 'sha256'
+    if not available.get(requested):
+        print(f"⚠️  {requested} is not installed, using sha256")
+        return 'sha256'
+    return requested
+
+def _madvise_sequential(mm):
+    """Ask for aggressive readahead on a mapping (Python 3.8+ on Unix; no-op elsewhere)"""
+    if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+
+def hash_file(file_path, chunk_size=1024 * 1024, algorithm='sha256'):
+    """
+    Calculate the SHA256 (or other new_hasher algorithm) hash of a file.
+    
+    Module-level so it can be sent to worker processes.
+
+    The file is memory-mapped and fed to hashlib in one call, so no data is
+    copied into Python buffers. Falls back to hashlib.file_digest (Python
+    3.11+) or pipelined chunked reads if the file can't be mapped.
+
+    Args:
+        file_path: Path to file
+        chunk_size: Size of chunks to read on the fallback path (default 1MB)
+        algorithm: new_hasher algorithm name (default sha256)
+
+    Returns:
+        str: Hexadecimal hash string
+    """
+    try:
+        with open(file_path, "rb") as f:
+            hasher = new_hasher(algorithm)
+            size = os.fstat(f.fileno()).st_size
+
+            if size == 0:
+                return hasher.hexdigest()  # mmap can't map empty files
+
+            try:
+                if sys.maxsize > 2**32:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        _madvise_sequential(mm)
+                        hasher.update(mm)
+                else:
+                    # 32-bit address space: map in 256MB windows
+                    window = 256 * 1024 * 1024
+                    for offset in range(0, size, window):
+                        length = min(window, size - offset)
+                        with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ,
+                                       offset=offset) as mm:
+                            _madvise_sequential(mm)
+                            hasher.update(mm)
+                # Backup files are hashed once - don't keep them in the page cache
+                drop_page_cache(file_path)
+                return hasher.hexdigest()
+            except (OSError, ValueError):
+                hasher = new_hasher(algorithm)
+                f.seek(0)
+
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, functools.partial(new_hasher, algorithm)).hexdigest()
+
+            _pipelined_update(hasher, f, chunk_size)
+            return hasher.hexdigest()
+    except Exception as e:
+        print(f"⚠️  Could not hash {file_path}: {e}")
+        return None
+
+@functools.lru_cache(maxsize=None)
+def _filesystem_type(directory):
+    """Type of the filesystem mounted at or above a directory (Linux only), or None"""
+    try:
+        with open('/proc/self/mounts') as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return None
+    directory = os.path.realpath(directory)
+    best, fs_type = '', None
+    for mount_point, mount_type in mounts:
+        # Spaces etc. in mount points are octal escaped (\040)
+        mount_point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), mount_point)
+        prefix = mount_point.rstrip('/') + '/'
+        if (directory == mount_point or directory.startswith(prefix)) and len(mount_point) >= len(best):
+            best, fs_type = mount_point, mount_type  # Later mounts shadow earlier ones
+    return fs_type
+
+def can_preallocate(file_path):
+    """True if posix_fallocate on this file reserves space without writing it"""
+    return (hasattr(os, 'posix_fallocate')
+            and _filesystem_type(os.path.dirname(os.path.abspath(file_path))) in NATIVE_FALLOCATE_FILESYSTEMS)
+
+def drop_page_cache(file_path):
+    """Ask the kernel to evict a finished file's cached pages (no-op where posix_fadvise is missing)"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+def fast_copy(src, dst, preserve_metadata=True):
+    """
+    shutil.copy2 that lets the kernel move the data on Linux.
+    
+    Uses copy_file_range (Python 3.8+; can clone blocks or copy server-side
+    on filesystems that support it) or sendfile, so file contents never pass
+    through a Python buffer. Other platforms use shutil.copy2, which is
+    already accelerated there (CopyFile2 on Windows with Python 3.12+).
+    
+    With preserve_metadata=False only the timestamps are copied (they are
+    what marks the copy as unchanged next time), skipping copystat's
+    permission, flag and extended attribute syscalls.
+    """
+    if not sys.platform.startswith('linux'):
+        if preserve_metadata:
+            shutil.copy2(src, dst)
+        else:
+            shutil.copyfile(src, dst)
+            src_stat = os.stat(src)
+            os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+        return
+    
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+        src_stat = os.fstat(in_fd)
+        remaining = src_stat.st_size
+        copy_range = getattr(os, 'copy_file_range', None)
+        
+        # Reserve the whole file up front so big copies aren't fragmented on the backup drive
+        preallocated = remaining >= PREALLOCATE_MIN_SIZE and can_preallocate(dst)
+        if preallocated:
+            try:
+                os.posix_fallocate(out_fd, 0, remaining)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    raise
+                preallocated = False  # Filesystem doesn't support it - carry on without
+        
+        # Large sources are read front to back exactly once: read ahead aggressively,
+        # then evict them so the copy doesn't push more useful data out of the page cache
+        hinted = remaining >= READAHEAD_MIN_SIZE
+        if hinted:
+            try:
+                os.posix_fadvise(in_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                os.posix_fadvise(in_fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                hinted = False
+        
+        try:
+            while remaining > 0:
+                count = min(remaining, 1 << 30)
+                if copy_range is not None:
+                    copied = copy_range(in_fd, out_fd, count)
+                else:
+                    copied = os.sendfile(out_fd, in_fd, None, count)
+                if not copied:
+                    break
+                remaining -= copied
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                raise
+            # Kernel can't copy between these files; finish from the current offsets
+            shutil.copyfileobj(fsrc, fdst, 4 * 1024 * 1024)
+        if preallocated:
+            fdst.truncate()  # In case the source shrank while it was being copied
+        if hinted:
+            try:
+                os.posix_fadvise(in_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            except OSError:
+                pass
+    if preserve_metadata:
+        shutil.copystat(src, dst)
+    else:
+        os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+def hash_files(jobs):
+    """Run (hash_function, file_path) jobs in one worker task; returns the hashes"""
+    return [hash_func(file_path) for hash_func, file_path in jobs]
+
+class QuickXorHash:
+    """
+    OneDrive's quickXorHash (the hash Graph reports for every file).
+    
+    Byte n of the input is XORed into a 160-bit circular register at bit
+    (n * 11) % 160; the file length is XORed into the last 8 bytes. Since the
+    bit pattern repeats every 160 bytes, input is XOR-folded 160 bytes at a
+    time using Python's big-int arithmetic and only spread into the register
+    in digest().
+    """
+    WIDTH_BITS = 160
+    SHIFT = 11
+    BLOCK = 160 * 4096  # Bytes folded per big-int operation
+    
+    def __init__(self, data=b''):
+        self._folded = 0  # XOR of all 160-byte aligned blocks
+        self._length = 0
+        if data:
+            self.update(data)
+    
+    @staticmethod
+    def _fold(block):
+        """XOR a block whose length is 160 * 2**k bytes down to 160 bytes"""
+        x = int.from_bytes(block, 'little')
+        bits = len(block) * 8
+        while bits > 1280:
+            bits >>= 1
+            x = (x >> bits) ^ (x & ((1 << bits) - 1))
+        return x
+    
+    def update(self, data):
+        data = memoryview(data).cast('B')
+        lead = self._length % 160
+        self._length += len(data)
+        
+        # Pad the first partial block on the left so the rest is 160-byte aligned
+        if lead:
+            head = bytes(data[:160 - lead])
+            data = data[160 - lead:]
+            self._folded ^= int.from_bytes(bytes(lead) + head, 'little')
+        
+        while data:
+            block = data[:self.BLOCK]
+            data = data[self.BLOCK:]
+            size = 160
+            while size < len(block):
+                size <<= 1
+            if size != len(block):
+                block = bytes(block) + bytes(size - len(block))  # Zero padding doesn't change an XOR
+            self._folded ^= self._fold(block)
+    
+    def digest(self):
+        register = 0
+        folded = self._folded.to_bytes(160, 'little')
+        for i, byte in enumerate(folded):
+            if byte:
+                register ^= byte << ((i * self.SHIFT) % self.WIDTH_BITS)
+        register = (register & ((1 << self.WIDTH_BITS) - 1)) ^ (register >> self.WIDTH_BITS)
+        register ^= (self._length & 0xFFFFFFFFFFFFFFFF) << (self.WIDTH_BITS - 64)
+        return register.to_bytes(self.WIDTH_BITS // 8, 'little')
+    
+    def base64digest(self):
+        """Digest in the base64 form used by the Graph API"""
+        return base64.b64encode(self.digest()).decode('ascii')
+
+def quickxor_file(file_path):
+    """Calculate the quickXorHash of a file (base64, as reported by Graph)"""
+    try:
+        hasher = QuickXorHash()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(QuickXorHash.BLOCK), b""):
+                hasher.update(chunk)
+        return hasher.base64digest()
+    except Exception as e:
+        print(f"⚠️  Could not hash {file_path}: {e}")
+        return None
+
+# Local hash functions for the server hashes Graph may report, in order of preference
+SERVER_HASH_FUNCS = {
+    'quickXorHash': quickxor_file,
+    'sha1Hash': functools.partial(hash_file, algorithm='sha1'),
+}
+
+def new_server_hasher(server_hash):
+    """Hash object matching a (hash_type, value) server hash, or None"""
+    if not server_hash:
+        return None
+    if server_hash[0] == 'quickXorHash':
+        return QuickXorHash()
+    if server_hash[0] == 'sha1Hash':
+        return hashlib.sha1()
+    return None
+
+def server_digest(hasher):
+    """Digest of a new_server_hasher object in Graph's format"""
+    if isinstance(hasher, QuickXorHash):
+        return hasher.base64digest()
+    return hasher.hexdigest()
+
+def server_hash_of(item):
+    """(hash_type, value) from a Graph drive item's file.hashes, or None"""
+    hashes = item.get('file', {}).get('hashes', {})
+    for hash_type in SERVER_HASH_FUNCS:
+        if hashes.get(hash_type):
+            value = hashes[hash_type]
+            return hash_type, value.lower() if hash_type == 'sha1Hash' else value
+    return None
+
+# One queued download; kept to the fields download_single_file needs instead of the Graph item
+DownloadTask = namedtuple('DownloadTask', 'item_id name size url server_hash local_path depth')
+
+class DownloadLimiter:
+    """
+    Resizable cap on how many download workers transfer at once.
+    
+    Starts at `ceiling` (the number of worker threads). A throttling response
+    lowers the cap by one straight away and holds it for at least the
+    Retry-After time. After each WORKER_TUNE_INTERVAL of completed downloads
+    the cap is raised by one again, unless the previous raise lowered the
+    measured bytes/sec, in which case it is taken back.
+    """
+    
+    def __init__(self, ceiling):
+        self.ceiling = ceiling
+        self.limit = ceiling
+        self.active = 0
+        self._cond = threading.Condition()
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._last_rate = 0.0
+        self._grew = False  # Whether the last window ended with a raise
+        self._hold_until = 0.0  # No raises before this time (after throttling)
+        self._last_cut = 0.0
+    
+    def acquire(self):
+        """Wait for a free download slot"""
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+    
+    def release(self, nbytes=0):
+        """Free a slot; nbytes is what the finished download transferred"""
+        with self._cond:
+            self.active -= 1
+            self._window_bytes += nbytes
+            now = time.monotonic()
+            elapsed = now - self._window_start
+            if elapsed >= WORKER_TUNE_INTERVAL:
+                rate = self._window_bytes / elapsed
+                if self._grew and rate < self._last_rate:
+                    self.limit = max(1, self.limit - 1)  # The extra worker didn't help
+                    self._grew = False
+                elif now >= self._hold_until and self.limit < self.ceiling:
+                    self.limit += 1
+                    self._grew = True
+                else:
+                    self._grew = False
+                self._last_rate = rate
+                self._window_start = now
+                self._window_bytes = 0
+            self._cond.notify_all()
+    
+    def throttled(self, retry_after=0):
+        """The server asked to slow down: drop one slot and hold off raising it again"""
+        with self._cond:
+            now = time.monotonic()
+            # A burst of throttled replies to requests already in flight counts once
+            if now - self._last_cut >= 1:
+                self.limit = max(1, self.limit - 1)
+                self._last_cut = now
+            self._grew = False
+            self._hold_until = max(self._hold_until,
+                                   now + max(retry_after, WORKER_TUNE_INTERVAL))
 
 class OneDriveBackup:
     def __init__(self):
         self.onedrive_path = self.find_onedrive_path()
-        self.backup_log = []
         self.access_token = None
         self.refresh_token = None
+        self.msal_app = None  # Set when signed in through msal (device code flow)
         self.client_id = None
         self.client_secret = None
         self.tenant_id = None
         self.use_api = False
         self.downloaded_files = {}  # Changed to dict to store metadata
         self.progress_file = None
+        self.backup_root = None  # Folder of the backup being downloaded
         self.large_file_threshold = 100 * 1024 * 1024  # 100MB
         self.file_metadata = {}  # Store file hashes and sizes for incremental backup
         self.metadata_file = None
-        self.max_workers = 3  # Number of parallel downloads
+        self.metadata_journal = None  # Append-only log of changes since the last snapshot
+        self.metadata_changes = deque()  # (item_id, info or None) not yet written to the journal
+        self.journal_entries = 0
+        self.max_workers = DEFAULT_DOWNLOAD_WORKERS  # Number of parallel downloads
+        self.copy_workers = DEFAULT_COPY_WORKERS  # Number of parallel copies for local backups
+        self.hdd_optimize = False  # Copy local files in on-disk (inode) order
+        self.preserve_metadata = True  # Copy permissions/attributes too, not just timestamps
         self.progress_lock = Lock()  # Thread-safe progress updates
+        self.progress_dirty = threading.Event()  # Set when downloaded_files has unsaved changes
+        self.progress_state = {}  # Active large downloads: destination -> (name, percent, MB/s, ETA)
+        self.progress_summary = ''  # Overall counters, drawn by the progress thread
+        self.completed_lines = deque()  # "✓ file" lines, printed in batches by the progress thread
+        self.download_queue = None  # Files found by scan_folder, waiting for a download worker
+        self.scan_extensions = None  # Extensions scan_folder includes (None = all files)
+        self.scan_space_limit = 0  # Free space the queued downloads must fit in (0 = unknown)
+        self.total_size_bytes = 0
+        self.queued_files = 0
+        self.scanned_files = 0
+        self.skipped_files = 0
+        self.out_of_space = False
+        self.consecutive_refresh_failures = 0
         self.verification_failures = []
-        
+        self.hash_pool = None  # Process pool for CPU-bound hash checks (created lazily)
+        self.paranoid = False  # Re-hash unchanged files instead of trusting size + mtime
+        self.hash_algo = resolve_hash_algo()  # Local integrity hash (see HASH_ALGOS)
+        
+        # Shared session so downloads reuse keep-alive connections instead of a new TLS handshake per file
+        self.session = requests.Session()
+        self.size_connection_pool()
+        # Throttling replies to any request narrow the download limit (see _note_throttling)
+        self.download_limiter = None
+        self.session.hooks['response'].append(self._note_throttling)
+        
+    def size_connection_pool(self):
+        """(Re)mount the session adapter with a pool sized for max_workers"""
+        # Retries are handled by the download code itself, so urllib3 must not retry silently
+        adapter = HTTPAdapter(pool_connections=self.max_workers,
+                              pool_maxsize=self.max_workers * 2,
+                              max_retries=Retry(total=0))
+        self.session.mount('https://', adapter)
+        
+        # Graph API calls (listings, fresh download URLs) back off and retry throttling and
+        # transient server errors; the last response is still returned to make_api_request
+        api_adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=self.max_workers,
+                                  max_retries=Retry(total=3, backoff_factor=0.5,
+                                                    status_forcelist=GRAPH_RETRY_STATUSES,
+                                                    raise_on_status=False))
+        self.session.mount(GRAPH_API_PREFIX, api_adapter)
+    
     def find_onedrive_path(self):
         """Automatically locate OneDrive folder"""
         possible_paths = [
@@ -79,28 +709,20 @@ class OneDriveBackup:
             bytes_size /= 1024.0
         return f"{bytes_size:.2f} PB"
     
-    def calculate_file_hash(self, file_path, chunk_size=8192):
-        """
-        Calculate SHA256 hash of a file.
-        
-        Args:
-            file_path: Path to file
-            chunk_size: Size of chunks to read (default 8KB)
-            
-        Returns:
-            str: Hexadecimal hash string
-        """
-        sha256_hash = hashlib.sha256()
-        try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(chunk_size), b""):
-                    sha256_hash.update(chunk)
-            return sha256_hash.hexdigest()
-        except Exception as e:
-            print(f"⚠️  Could not hash {file_path}: {e}")
-            return None
+    def format_eta(self, seconds):
+        """Format a remaining-time estimate as 1.5h / 3.2m / 40s"""
+        if seconds > 3600:
+            return f"{seconds/3600:.1f}h"
+        elif seconds > 60:
+            return f"{seconds/60:.1f}m"
+        return f"{seconds:.0f}s"
+    
+    def calculate_file_hash(self, file_path, chunk_size=1024 * 1024):
+        """Calculate a file's hash with the configured algorithm (see hash_file)"""
+        return hash_file(file_path, chunk_size, self.hash_algo)
     
-    def verify_file(self, file_path, expected_size, item_id=None):
+    def verify_file(self, file_path, expected_size, item_id=None, actual_hash=None, server_hash=None,
+                    actual_server_hash=None):
         """
         Verify downloaded file integrity.
         
@@ -108,40 +730,54 @@ class OneDriveBackup:
             file_path: Path to downloaded file
             expected_size: Expected file size in bytes
             item_id: OneDrive item ID (optional)
+            actual_hash: hash_algo digest computed while downloading (optional, skips re-reading the file)
+            server_hash: (hash_type, value) reported by Graph, stored for later checks (optional)
+            actual_server_hash: Same hash type computed while downloading, compared to server_hash (optional)
             
         Returns:
             bool: True if file is valid, False otherwise
         """
         try:
-            if not file_path.exists():
+            try:
+                file_stat = os.stat(file_path)
+            except FileNotFoundError:
                 return False
-            
-            actual_size = file_path.stat().st_size
+            actual_size = file_stat.st_size
             
             # Size verification
             if actual_size != expected_size:
                 print(f"⚠️  Size mismatch: {file_path.name} (expected {expected_size}, got {actual_size})")
                 # Remove bad metadata if it exists
                 if item_id and item_id in self.file_metadata:
-                    with self.progress_lock:
-                        del self.file_metadata[item_id]
+                    self._drop_metadata(item_id)
+                return False
+            
+            # Content check against OneDrive's own hash (no re-read: computed during download)
+            if server_hash and actual_server_hash and actual_server_hash != server_hash[1]:
+                print(f"⚠️  {server_hash[0]} mismatch: {file_path.name}")
+                if item_id and item_id in self.file_metadata:
+                    self._drop_metadata(item_id)
                 return False
             
             # Calculate hash for integrity check
-            file_hash = self.calculate_file_hash(file_path)
+            file_hash = actual_hash or self.calculate_file_hash(file_path)
             if not file_hash:
                 print(f"⚠️  Could not calculate hash for {file_path.name}")
                 return False
             
             # Only store metadata if file is valid AND has actual content
             if file_hash and item_id and actual_size > 0:  # ← Added size check
-                with self.progress_lock:
-                    self.file_metadata[item_id] = {
-                        'size': actual_size,
-                        'hash': file_hash,
-                        'path': str(file_path),
-                        'modified': datetime.now().isoformat()
-                    }
+                info = {
+                    'size': actual_size,
+                    'hash': file_hash,
+                    'hash_algo': self.hash_algo,
+                    'path': str(file_path),
+                    'mtime_ns': file_stat.st_mtime_ns,
+                    'modified': datetime.now().isoformat()
+                }
+                if server_hash:
+                    info['server_hash_type'], info['server_hash'] = server_hash
+                self._set_metadata(item_id, info)
             elif actual_size == 0:
                 print(f"⚠️  Skipping metadata for 0-byte file: {file_path.name}")
             
@@ -151,30 +787,44 @@ class OneDriveBackup:
             print(f"⚠️  Verification error for {file_path}: {e}")
             # Remove bad metadata if it exists
             if item_id and item_id in self.file_metadata:
-                with self.progress_lock:
-                    del self.file_metadata[item_id]
+                self._drop_metadata(item_id)
             return False
     
-    def should_download_file(self, item_id, file_size, file_path):
+    # Single dict operations and deque.append are atomic, so the metadata index
+    # is updated without taking progress_lock
+    def _set_metadata(self, item_id, info):
+        """Record a verified file in the metadata index (thread-safe)"""
+        self.file_metadata[item_id] = info
+        self.metadata_changes.append((item_id, info))
+    
+    def _drop_metadata(self, item_id):
+        """Remove a file from the metadata index (thread-safe)"""
+        if self.file_metadata.pop(item_id, None) is not None:
+            self.metadata_changes.append((item_id, None))
+    
+    def _check_local_file(self, item_id, file_size, file_path, server_hash=None):
         """
-        Determine if file needs to be downloaded (incremental backup logic).
+        Cheap (no hashing) part of the incremental backup check.
         
-        Args:
-            item_id: OneDrive item ID
-            file_size: Size of file in OneDrive
-            file_path: Local destination path
-            
         Returns:
-            bool: True if file should be downloaded, False if can skip
+            True to download, False to skip, or a (hash_function, expected_hash)
+            tuple when the local file still has to be hashed and compared
         """
-        # If file doesn't exist locally, must download
-        if not file_path.exists():
+        # If file doesn't exist locally, must download (one stat call covers both checks)
+        try:
+            local_stat = os.stat(file_path)
+        except FileNotFoundError:
             return True
+        local_size = local_stat.st_size
+        metadata = self.file_metadata.get(item_id)
         
         # If we have no metadata, check if file size matches (trust the file on disk)
-        if item_id not in self.file_metadata:
-            local_size = file_path.stat().st_size
-            
+        if metadata is None:
+            # Finished earlier in an interrupted run and untouched since
+            progress = self.downloaded_files.get(item_id)
+            if (progress and local_size == file_size == progress.get('size')
+                    and local_stat.st_mtime_ns == progress.get('mtime_ns')):
+                return False
             # If size matches, trust the file and skip download
             if local_size == file_size and local_size > 0:
                 print(f"  ✓ File exists with correct size, skipping: {file_path.name}")
@@ -188,10 +838,6 @@ class OneDriveBackup:
                     print(f"  ⚠️  Could not delete mismatched file: {e}")
                 return True
         
-        # Check if local file matches metadata
-        metadata = self.file_metadata[item_id]
-        local_size = file_path.stat().st_size
-        
         # If sizes don't match, delete and re-download
         if local_size != metadata.get('size') or local_size != file_size:
             print(f"  🔄 Size mismatch, re-downloading: {file_path.name}")
@@ -201,29 +847,136 @@ class OneDriveBackup:
                 print(f"  ⚠️  Could not delete mismatched file: {e}")
             return True
         
-        # Verify hash if available
+        # Same size but different content in OneDrive since the last backup
+        if server_hash and metadata.get('server_hash') and server_hash[1] != metadata['server_hash']:
+            print(f"  🔄 Changed in OneDrive, re-downloading: {file_path.name}")
+            return True
+        
+        # Same size and mtime as when it was verified - trust it without hashing
+        if not self.paranoid and local_stat.st_mtime_ns == metadata.get('mtime_ns'):
+            return False
+        
+        # Hash still needs verifying - against the server's own hash when we have one
+        if metadata.get('server_hash_type') in SERVER_HASH_FUNCS:
+            return SERVER_HASH_FUNCS[metadata['server_hash_type']], metadata['server_hash']
         if 'hash' in metadata:
-            local_hash = self.calculate_file_hash(file_path)
-            if local_hash != metadata['hash']:
-                print(f"  🔄 Hash mismatch (corrupted), re-downloading: {file_path.name}")
-                try:
-                    file_path.unlink()
-                except Exception as e:
-                    print(f"  ⚠️  Could not delete corrupted file: {e}")
-                return True
+            # Entries written before hash_algo was recorded are SHA256
+            return functools.partial(hash_file, algorithm=metadata.get('hash_algo', 'sha256')), metadata['hash']
         
         # File is identical, skip download
         return False
     
+    def _compare_hash(self, file_path, local_hash, expected_hash):
+        """Delete a corrupted local file; returns True if it must be re-downloaded"""
+        if local_hash != expected_hash:
+            print(f"  🔄 Hash mismatch (corrupted), re-downloading: {file_path.name}")
+            try:
+                file_path.unlink()
+            except Exception as e:
+                print(f"  ⚠️  Could not delete corrupted file: {e}")
+            return True
+        return False
+    
+    def should_download_file(self, item_id, file_size, file_path, server_hash=None):
+        """
+        Determine if file needs to be downloaded (incremental backup logic).
+        
+        Args:
+            item_id: OneDrive item ID
+            file_size: Size of file in OneDrive
+            file_path: Local destination path
+            server_hash: (hash_type, value) currently reported by Graph (optional)
+            
+        Returns:
+            bool: True if file should be downloaded, False if can skip
+        """
+        check = self._check_local_file(item_id, file_size, file_path, server_hash)
+        if isinstance(check, bool):
+            return check
+        
+        # Verify hash
+        hash_func, expected_hash = check
+        return self._compare_hash(file_path, hash_func(file_path), expected_hash)
+    
+    def should_download_files(self, candidates):
+        """
+        Batch version of should_download_file.
+        
+        Hash checks are CPU-bound, so they are spread over a process pool
+        instead of running one after another on the calling thread. Small
+        files are grouped into batches so each worker task does real work.
+        
+        Args:
+            candidates: List of (item_id, file_size, file_path, server_hash) tuples
+            
+        Returns:
+            list: One bool per candidate, True if it should be downloaded
+        """
+        results = [None] * len(candidates)
+        pending = {}
+        batch = []  # (idx, expected_hash, hash_func) for small files
+        batch_bytes = 0
+        
+        def submit(jobs):
+            if self.hash_pool is None:
+                self.hash_pool = ProcessPoolExecutor(max_workers=min(MAX_PROCESS_WORKERS, os.cpu_count() or 1))
+            future = self.hash_pool.submit(hash_files, [(func, candidates[idx][2]) for idx, _, func in jobs])
+            pending[future] = [(idx, expected_hash) for idx, expected_hash, _ in jobs]
+        
+        for idx, (item_id, file_size, file_path, server_hash) in enumerate(candidates):
+            check = self._check_local_file(item_id, file_size, file_path, server_hash)
+            if isinstance(check, bool):
+                results[idx] = check
+                continue
+            
+            hash_func, expected_hash = check
+            if file_size >= HASH_BATCH_BYTES:
+                submit([(idx, expected_hash, hash_func)])
+                continue
+            batch.append((idx, expected_hash, hash_func))
+            batch_bytes += file_size
+            if len(batch) >= HASH_BATCH_FILES or batch_bytes >= HASH_BATCH_BYTES:
+                submit(batch)
+                batch = []
+                batch_bytes = 0
+        if batch:
+            submit(batch)
+        
+        for future in as_completed(pending):
+            for (idx, expected_hash), local_hash in zip(pending[future], future.result()):
+                file_path = candidates[idx][2]
+                results[idx] = self._compare_hash(file_path, local_hash, expected_hash)
+        
+        return results
+    
     def load_metadata(self, backup_root):
         """Load existing backup metadata for incremental backups"""
         self.metadata_file = backup_root / ".backup_metadata.json"
+        self.metadata_journal = backup_root / ".backup_metadata.journal"
+        self.metadata_changes = deque()
+        self.journal_entries = 0
         
-        if self.metadata_file.exists():
+        if self.metadata_file.exists() or self.metadata_journal.exists():
             try:
-                with open(self.metadata_file, 'r') as f:
-                    data = json.load(f)
-                    raw_metadata = data.get('files', {})
+                raw_metadata = {}
+                if self.metadata_file.exists():
+                    with open(self.metadata_file, 'rb') as f:
+                        data = json_loads(f.read())
+                        raw_metadata = data.get('files', {})
+                
+                # Replay changes made since the snapshot was written
+                if self.metadata_journal.exists():
+                    with open(self.metadata_journal, 'rb') as f:
+                        for line in f:
+                            try:
+                                item_id, info = json_loads(line)
+                            except ValueError:
+                                break  # Torn last line from an interrupted run
+                            if info is None:
+                                raw_metadata.pop(item_id, None)
+                            else:
+                                raw_metadata[item_id] = info
+                            self.journal_entries += 1
                 
                 # Cleanse metadata: Remove 0-byte entries (from Files On-Demand placeholders)
                 original_count = len(raw_metadata)
@@ -244,20 +997,39 @@ class OneDriveBackup:
                 print(f"⚠️  Could not load metadata: {e}")
                 self.file_metadata = {}
     
-    def save_metadata(self):
-        """Save backup metadata for future incremental backups (thread-safe)"""
+    def save_metadata(self, compact=False):
+        """
+        Save backup metadata for future incremental backups (thread-safe).
+        
+        Changes since the last call are appended to the journal; the full
+        snapshot is only rewritten every METADATA_COMPACT_EVERY entries or
+        when compact is True.
+        """
         if self.metadata_file:
             try:
-                # Create thread-safe snapshot
-                with self.progress_lock:
-                    metadata_snapshot = dict(self.file_metadata)
+                # Drain queued changes; ones added meanwhile wait for the next save
+                changes = [self.metadata_changes.popleft() for _ in range(len(self.metadata_changes))]
+                self.journal_entries += len(changes)
+                compact = compact or self.journal_entries >= METADATA_COMPACT_EVERY
+                if compact:
+                    # dict.copy() is atomic, so no lock is needed for the snapshot
+                    metadata_snapshot = self.file_metadata.copy()
+                    self.journal_entries = 0
                 
-                # Write snapshot to file
-                with open(self.metadata_file, 'w') as f:
-                    json.dump({
-                        'files': metadata_snapshot,
-                        'last_backup': datetime.now().isoformat()
-                    }, f, indent=2)
+                if compact:
+                    # Write snapshot to file, then start a fresh journal
+                    temp_file = self.metadata_file.with_name(self.metadata_file.name + '.tmp')
+                    with open(temp_file, 'wb') as f:
+                        f.write(json_dumps({
+                            'files': metadata_snapshot,
+                            'last_backup': datetime.now().isoformat()
+                        }))
+                    os.replace(temp_file, self.metadata_file)
+                    if self.metadata_journal.exists():
+                        self.metadata_journal.unlink()
+                elif changes:
+                    with open(self.metadata_journal, 'ab') as f:
+                        f.writelines(json_dumps([item_id, info]) + b'\n' for item_id, info in changes)
             except Exception as e:
                 print(f"⚠️  Could not save metadata: {e}")
     
@@ -308,6 +1080,9 @@ class OneDriveBackup:
         client_id = "d3590ed6-52b3-4102-aeff-aad2292ab01c"  # Microsoft Office client
         authority = "https://login.microsoftonline.com/common"
         
+        if msal is not None:
+            return self._device_code_auth_msal(client_id, authority)
+        
         # Request device code
         device_code_url = f"{authority}/oauth2/v2.0/devicecode"
         data = {
@@ -316,7 +1091,7 @@ class OneDriveBackup:
         }
         
         try:
-            response = requests.post(device_code_url, data=data)
+            response = self.session.post(device_code_url, data=data)
             device_code_data = response.json()
             
             if 'error' in device_code_data:
@@ -342,10 +1117,11 @@ class OneDriveBackup:
             
             interval = device_code_data.get('interval', 5)
             expires_at = time.time() + device_code_data['expires_in']
+            print("⏳ Waiting for authentication...")
             
             while time.time() < expires_at:
                 time.sleep(interval)
-                token_response = requests.post(token_url, data=token_data)
+                token_response = self.session.post(token_url, data=token_data)
                 token_result = token_response.json()
                 
                 if 'access_token' in token_result:
@@ -354,7 +1130,10 @@ class OneDriveBackup:
                     print("✅ Successfully authenticated!\n")
                     return True
                 elif token_result.get('error') == 'authorization_pending':
-                    print("⏳ Waiting for authentication...", end='\r')
+                    continue
+                elif token_result.get('error') == 'slow_down':
+                    # Polling too fast - RFC 8628 asks for 5 more seconds between polls from now on
+                    interval += 5
                     continue
                 elif token_result.get('error') == 'authorization_declined':
                     print("\n❌ Authentication declined")
@@ -373,6 +1152,46 @@ class OneDriveBackup:
             print(f"❌ Authentication error: {e}")
             return False
     
+    def _device_code_auth_msal(self, client_id, authority):
+        """Device code flow via msal (polls with RFC 8628 back-off and keeps a refreshable token cache)"""
+        try:
+            app = msal.PublicClientApplication(client_id, authority=authority)
+            flow = app.initiate_device_flow(scopes=MSAL_SCOPES)
+            
+            if 'user_code' not in flow:
+                print(f"❌ Error: {flow.get('error_description', 'Unknown error')}")
+                return False
+            
+            print("\n" + "="*50)
+            print("🔐 AUTHENTICATION REQUIRED")
+            print("="*50)
+            print(f"\n1. Go to: {flow['verification_uri']}")
+            print(f"2. Enter code: {flow['user_code']}")
+            print(f"3. Sign in with your Microsoft account")
+            print(f"\nWaiting for authentication (expires in {flow['expires_in']//60} minutes)...")
+            print("="*50 + "\n")
+            
+            # Blocks until the user signs in, declines or the code expires
+            result = app.acquire_token_by_device_flow(flow)
+            
+            if 'access_token' in result:
+                self.access_token = result['access_token']
+                self.msal_app = app
+                self.use_api = True
+                print("✅ Successfully authenticated!\n")
+                return True
+            elif result.get('error') == 'authorization_declined':
+                print("\n❌ Authentication declined")
+            elif result.get('error') == 'expired_token':
+                print("\n❌ Authentication expired")
+            else:
+                print(f"\n❌ Error: {result.get('error_description', 'Unknown error')}")
+            return False
+            
+        except Exception as e:
+            print(f"❌ Authentication error: {e}")
+            return False
+    
     def app_credentials_auth(self):
         """Authenticate using app credentials (requires app registration)"""
         print("\n🔑 App Credentials Authentication")
@@ -396,7 +1215,7 @@ class OneDriveBackup:
         }
         
         try:
-            response = requests.post(token_url, data=data)
+            response = self.session.post(token_url, data=data)
             result = response.json()
             
             if 'access_token' in result:
@@ -456,7 +1275,7 @@ class OneDriveBackup:
         }
         
         try:
-            response = requests.post(token_url, data=data)
+            response = self.session.post(token_url, data=data)
             result = response.json()
             
             if 'access_token' in result:
@@ -474,6 +1293,17 @@ class OneDriveBackup:
     
     def refresh_access_token(self):
         """Refresh the access token using refresh token"""
+        if self.msal_app is not None:
+            # msal keeps the refresh token in its own cache
+            accounts = self.msal_app.get_accounts()
+            result = self.msal_app.acquire_token_silent(MSAL_SCOPES, account=accounts[0]) if accounts else None
+            if result and 'access_token' in result:
+                self.access_token = result['access_token']
+                print("✅ Token refreshed!")
+                return True
+            print("❌ Token refresh failed")
+            return False
+        
         if not self.refresh_token:
             return False
         
@@ -487,7 +1317,7 @@ class OneDriveBackup:
         }
         
         try:
-            response = requests.post(token_url, data=data)
+            response = self.session.post(token_url, data=data)
             result = response.json()
             
             if 'access_token' in result:
@@ -502,7 +1332,202 @@ class OneDriveBackup:
             print(f"❌ Token refresh error: {e}")
             return False
     
-    def download_large_file(self, url, destination, filename, expected_size, depth=0, item_id=None):
+    def _download_segmented(self, url, destination, filename, expected_size, depth=0,
+                            item_id=None, server_hash=None):
+        """
+        Download a big file as DOWNLOAD_SEGMENTS parallel byte ranges.
+        
+        Each range is written at its own offset of a preallocated .parts file.
+        Per-range progress is kept in a .parts.json sidecar so an interrupted
+        download resumes every range where it stopped.
+        
+        Returns:
+            A success response, None on failure, or False if the server
+            ignores Range headers (caller falls back to a single stream)
+        """
+        indent = '  ' * depth
+        part_file = destination.parent / f".{destination.name}.parts"
+        state_file = destination.parent / f".{destination.name}.parts.json"
+        
+        # [start, end, next offset to fetch] per range
+        segments = None
+        if part_file.exists() and state_file.exists():
+            try:
+                state = json_loads(state_file.read_bytes())
+                if state.get('size') == expected_size:
+                    segments = state['segments']
+            except (OSError, ValueError, KeyError):
+                segments = None
+        
+        if segments is None:
+            segment_size = -(-expected_size // DOWNLOAD_SEGMENTS)
+            segments = [[start, min(start + segment_size, expected_size), start]
+                        for start in range(0, expected_size, segment_size)]
+            with open(part_file, 'wb') as f:
+                if can_preallocate(part_file):
+                    try:
+                        os.posix_fallocate(f.fileno(), 0, expected_size)
+                    except OSError as e:
+                        if e.errno == errno.ENOSPC:
+                            raise
+                f.truncate(expected_size)
+        else:
+            done = sum(seg[2] - seg[0] for seg in segments)
+            print(f"  {indent}📥 Resuming {filename} from {done / (1024*1024):.1f}MB")
+        
+        state_lock = Lock()
+        url_lock = Lock()
+        stop = threading.Event()
+        current_url = [url]
+        no_range_support = []
+        
+        def save_state():
+            with state_lock:
+                data = json_dumps({'size': expected_size, 'segments': segments})
+            # Every offset in the snapshot was already written (unbuffered, see fetch);
+            # sync those bytes to disk before the sidecar claims them
+            with open(part_file, 'r+b') as f:
+                os.fsync(f.fileno())
+            state_file.write_bytes(data)
+        
+        def fetch(seg):
+            """Download one range, retrying network errors"""
+            retry_count = 0
+            refresh_count = 0  # 401s since this range last got data
+            buffer = memoryview(bytearray(1024 * 1024))
+            # Unbuffered, so an offset only moves forward once its bytes are in the OS's hands
+            with open(part_file, 'r+b', buffering=0) as f:
+                while seg[2] < seg[1] and not stop.is_set():
+                    request_url = current_url[0]
+                    try:
+                        with self.session.get(request_url, headers={'Range': f'bytes={seg[2]}-{seg[1] - 1}'},
+                                              stream=True, timeout=60) as response:
+                            if response.status_code == 401 and item_id:
+                                refresh_count += 1
+                                if refresh_count > 3:
+                                    raise RuntimeError("Download URL keeps being rejected after refreshing it")
+                                # Only one range refreshes the expired URL; the others pick it up
+                                with url_lock:
+                                    if current_url[0] == request_url:
+                                        fresh_url = self.get_fresh_download_url(item_id)
+                                        if not fresh_url:
+                                            raise RuntimeError("Download URL expired and could not be refreshed")
+                                        current_url[0] = fresh_url
+                                continue
+                            if response.status_code == 200:
+                                no_range_support.append(True)
+                                stop.set()
+                                return
+                            if response.status_code != 206:
+                                raise RuntimeError(f"HTTP {response.status_code}")
+                            
+                            refresh_count = 0
+                            f.seek(seg[2])
+                            response.raw.decode_content = True
+                            while seg[2] < seg[1] and not stop.is_set():
+                                n = response.raw.readinto(buffer[:min(len(buffer), seg[1] - seg[2])])
+                                if not n:
+                                    break
+                                chunk = buffer[:n]
+                                while chunk:
+                                    chunk = chunk[f.write(chunk):]
+                                with state_lock:
+                                    seg[2] += n
+                        
+                        if seg[2] < seg[1] and not stop.is_set():
+                            retry_count += 1
+                            if retry_count >= 3:
+                                raise RuntimeError("Connection closed before the range was complete")
+                    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+                        retry_count += 1
+                        if retry_count >= 3:
+                            raise
+                        print(f"\n  {indent}⚠️  Network error for {filename}, retrying range ({retry_count}/3): {e}")
+                        time.sleep(5)
+        
+        short_name = filename[:35]
+        last_time = time.time()
+        last_done = sum(seg[2] - seg[0] for seg in segments)
+        pending = [seg for seg in segments if seg[2] < seg[1]]
+        
+        try:
+            with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as pool:
+                futures = [pool.submit(fetch, seg) for seg in pending]
+                not_done = futures
+                while not_done:
+                    finished, not_done = wait(not_done, timeout=2, return_when=FIRST_EXCEPTION)
+                    # Stop the other ranges as soon as one fails; they keep the offsets they reached
+                    for future in finished:
+                        if future.exception() is not None:
+                            stop.set()
+                            raise future.exception()
+                    
+                    current_time = time.time()
+                    with state_lock:
+                        done = sum(seg[2] - seg[0] for seg in segments)
+                    speed = (done - last_done) / max(current_time - last_time, 1e-6) / (1024 * 1024)
+                    eta = (expected_size - done) / (speed * 1024 * 1024) if speed > 0 else 0
+                    self.progress_state[destination] = (short_name, done / expected_size * 100,
+                                                        speed, self.format_eta(eta))
+                    last_time, last_done = current_time, done
+                    save_state()
+        except KeyboardInterrupt:
+            stop.set()
+            save_state()
+            print(f"\n  {indent}⏸️  Download interrupted for {filename}, progress saved to {state_file.name}")
+            raise
+        except Exception as e:
+            save_state()
+            print(f"\n  {indent}❌ Error downloading {filename}: {e}")
+            return None
+        
+        if no_range_support:
+            part_file.unlink()
+            state_file.unlink()
+            return False
+        
+        # Flush to disk once, then move into place
+        with open(part_file, 'r+b') as f:
+            os.fsync(f.fileno())
+        os.replace(part_file, destination)
+        state_file.unlink()
+        
+        # Ranges arrive out of order, so neither hash can be computed while writing:
+        # feed the local and Graph's hash from one sequential read instead
+        actual_hash = actual_server_hash = None
+        hasher = new_hasher(self.hash_algo)
+        server_hasher = new_server_hasher(server_hash)
+        try:
+            buffer = memoryview(bytearray(4 * 1024 * 1024))
+            with open(destination, 'rb') as f:
+                for n in iter(lambda: f.readinto(buffer), 0):
+                    hasher.update(buffer[:n])
+                    if server_hasher is not None:
+                        server_hasher.update(buffer[:n])
+            actual_hash = hasher.hexdigest()
+            if server_hasher is not None:
+                actual_server_hash = server_digest(server_hasher)
+            drop_page_cache(destination)
+        except OSError as e:
+            print(f"  {indent}⚠️  Could not hash {filename}: {e}")
+        if (not actual_hash
+                or not self.verify_file(destination, expected_size, item_id, actual_hash=actual_hash,
+                                        server_hash=server_hash, actual_server_hash=actual_server_hash)):
+            with self.progress_lock:
+                self.verification_failures.append(str(destination))
+            print(f"  {indent}❌ Verification failed for {filename}, removing it")
+            try:
+                destination.unlink()
+            except OSError:
+                pass
+            return None
+        
+        class SuccessResponse:
+            status_code = 200
+        
+        return SuccessResponse()
+    
+    def download_large_file(self, url, destination, filename, expected_size, depth=0, item_id=None, server_hash=None):
         """
         Download large files in chunks with progress tracking and resume capability.
         
@@ -514,11 +1539,15 @@ class OneDriveBackup:
         - Graceful handling of interruptions
         - Post-download verification
         - Proactive URL refresh for huge files (>10GB)
+        - Parallel range requests for files over 1GB (see _download_segmented)
         """
+        indent = '  ' * depth
+        is_huge = expected_size > 10 * 1024 * 1024 * 1024  # > 10 GB
+        
         # Adaptive chunk size based on file size
-        if expected_size > 10 * 1024 * 1024 * 1024:  # > 10 GB
+        if is_huge:
             chunk_size = 50 * 1024 * 1024  # 50 MB chunks for huge files
-            print(f"  {'  ' * depth}📦 Huge file detected ({expected_size/(1024**3):.1f}GB), using 50MB chunks")
+            print(f"  {indent}📦 Huge file detected ({expected_size/(1024**3):.1f}GB), using 50MB chunks")
         elif expected_size > 1 * 1024 * 1024 * 1024:  # > 1 GB
             chunk_size = 20 * 1024 * 1024  # 20 MB chunks for large files
         else:
@@ -526,14 +1555,24 @@ class OneDriveBackup:
         
         temp_file = destination.parent / f".{destination.name}.download"
         
+        # Big files use parallel range requests (unless a single-stream download is being resumed)
+        if expected_size > SEGMENTED_DOWNLOAD_THRESHOLD and not temp_file.exists():
+            result = self._download_segmented(url, destination, filename, expected_size, depth,
+                                              item_id, server_hash)
+            if result is not False:
+                return result
+            print(f"  {indent}⚠️  Server doesn't support range requests, using a single stream")
+        
         # Check if partial download exists
         downloaded_size = 0
         if temp_file.exists():
             downloaded_size = temp_file.stat().st_size
-            print(f"  {'  ' * depth}📥 Resuming {filename} from {downloaded_size / (1024*1024):.1f}MB")
+            print(f"  {indent}📥 Resuming {filename} from {downloaded_size / (1024*1024):.1f}MB")
         
         max_retries = 3
         retry_count = 0
+        hasher = None  # hash_algo digest of the bytes written so far, kept across retries
+        server_hasher = None  # Same, for the hash type Graph reports
         download_start_time = time.time()
         last_url_refresh_time = download_start_time
         url_refresh_interval = 60 * 60  # Refresh URL every 60 minutes for huge files
@@ -545,44 +1584,44 @@ class OneDriveBackup:
                 if downloaded_size > 0:
                     headers_with_range['Range'] = f'bytes={downloaded_size}-'
                 
-                response = requests.get(url, headers=headers_with_range, stream=True, timeout=60)
+                response = self.session.get(url, headers=headers_with_range, stream=True, timeout=60)
                 
                 # If server doesn't support resume (206), start fresh
                 if downloaded_size > 0 and response.status_code not in [200, 206]:
                     if response.status_code == 416:  # Range not satisfiable - file might be complete
                         # Check if temp file size matches what we expect
                         if temp_file.exists():
-                            temp_file.rename(destination)
+                            os.replace(temp_file, destination)
                             # Verify the file
-                            if self.verify_file(destination, expected_size, item_id):
+                            if self.verify_file(destination, expected_size, item_id, server_hash=server_hash):
                                 class SuccessResponse:
                                     status_code = 200
                                 return SuccessResponse()
                             else:
-                                print(f"  {'  ' * depth}❌ Verification failed, re-downloading")
+                                print(f"  {indent}❌ Verification failed, re-downloading")
                                 destination.unlink()
                                 downloaded_size = 0
                                 continue
                     
-                    print(f"  {'  ' * depth}⚠️  Server doesn't support resume (status {response.status_code}), starting fresh")
+                    print(f"  {indent}⚠️  Server doesn't support resume (status {response.status_code}), starting fresh")
                     downloaded_size = 0
                     if temp_file.exists():
                         temp_file.unlink()
-                    response = requests.get(url, stream=True, timeout=60)
+                    response = self.session.get(url, stream=True, timeout=60)
                 
                 if response.status_code not in [200, 206]:
                     # If 401 and we're just starting, try to get a fresh download URL
                     if response.status_code == 401 and downloaded_size == 0 and item_id:
-                        print(f"\n  {'  ' * depth}🔄 {filename}: Download URL expired, refreshing...")
+                        print(f"\n  {indent}🔄 {filename}: Download URL expired, refreshing...")
                         fresh_url = self.get_fresh_download_url(item_id)
                         if fresh_url:
                             url = fresh_url  # Update URL for next retry
                             continue  # Retry with fresh URL
                         else:
-                            print(f"  {'  ' * depth}❌ Could not refresh download URL")
+                            print(f"  {indent}❌ Could not refresh download URL")
                             return None
                     
-                    print(f"  {'  ' * depth}❌ HTTP {response.status_code} received")
+                    print(f"  {indent}❌ HTTP {response.status_code} received")
                     return response
                 
                 # Get total file size
@@ -597,32 +1636,82 @@ class OneDriveBackup:
                     # Full content
                     total_size = int(response.headers.get('content-length', 0))
                 
-                # Open file in append mode if resuming, write mode if starting fresh
-                mode = 'ab' if downloaded_size > 0 and response.status_code == 206 else 'wb'
+                # Open file for update at the resume offset if resuming, write mode if starting fresh
+                # (append mode would write past any preallocated space)
+                mode = 'r+b' if downloaded_size > 0 and response.status_code == 206 else 'wb'
                 if mode == 'wb':
                     downloaded_size = 0  # Reset if starting fresh
                 
                 with open(temp_file, mode) as f:
-                    start_time = time.time()
-                    last_print_time = start_time
-                    chunk_start_time = start_time
-                    chunk_start_size = downloaded_size
+                    buffer = memoryview(bytearray(chunk_size))
                     
-                    for chunk in response.iter_content(chunk_size=chunk_size):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded_size += len(chunk)
+                    # Hash the data as it is written; when resuming a previous run,
+                    # hash the existing prefix once first
+                    if mode == 'wb' or hasher is None:
+                        hasher = new_hasher(self.hash_algo)
+                        server_hasher = new_server_hasher(server_hash)
+                        remaining = downloaded_size
+                        while remaining > 0:
+                            n = f.readinto(buffer[:min(remaining, chunk_size)])
+                            if not n:
+                                break
+                            hasher.update(buffer[:n])
+                            if server_hasher:
+                                server_hasher.update(buffer[:n])
+                            remaining -= n
+                    f.seek(downloaded_size)
+                    
+                    # Reserve the whole file up front (Linux) to avoid fragmentation and
+                    # running out of space halfway through a huge download
+                    if can_preallocate(temp_file) and total_size > downloaded_size:
+                        try:
+                            os.posix_fallocate(f.fileno(), downloaded_size, total_size - downloaded_size)
+                            os.posix_fadvise(f.fileno(), 0, total_size, os.POSIX_FADV_SEQUENTIAL)
+                        except OSError as e:
+                            if e.errno == errno.ENOSPC:
+                                raise
+                            # Filesystem doesn't support preallocation - carry on without it
+                    
+                    try:
+                        short_name = filename[:35]
+                        start_time = time.time()
+                        last_print_time = start_time
+                        chunk_start_time = start_time
+                        chunk_start_size = downloaded_size
+                        
+                        # Read into one reusable buffer instead of allocating a new bytes object per chunk
+                        response.raw.decode_content = True
+                        
+                        # Bind per-chunk lookups to locals
+                        readinto = response.raw.readinto
+                        write = f.write
+                        update_hash = hasher.update
+                        update_server_hash = server_hasher.update if server_hasher else None
+                        now = time.time
+                        refresh_url = is_huge and item_id
+                        one_mb = 1024 * 1024
+                        
+                        while True:
+                            n = readinto(buffer)
+                            if not n:
+                                break
+                            chunk = buffer[:n]
+                            write(chunk)
+                            update_hash(chunk)
+                            if update_server_hash:
+                                update_server_hash(chunk)
+                            downloaded_size += n
                             
                             # Print progress every 2 seconds
-                            current_time = time.time()
+                            current_time = now()
                             
                             # For huge files (>10GB), proactively refresh URL every 60 minutes
-                            if expected_size > 10 * 1024 * 1024 * 1024 and item_id:
+                            if refresh_url:
                                 if current_time - last_url_refresh_time >= url_refresh_interval:
-                                    print(f"\n  {'  ' * depth}🔄 Proactive URL refresh (60 min elapsed)...")
+                                    print(f"\n  {indent}🔄 Proactive URL refresh (60 min elapsed)...")
                                     fresh_url = self.get_fresh_download_url(item_id)
                                     if fresh_url:
-                                        print(f"  {'  ' * depth}✓ Fresh URL obtained, continuing download...")
+                                        print(f"  {indent}✓ Fresh URL obtained, continuing download...")
                                         url = fresh_url
                                         last_url_refresh_time = current_time
                                         # Save progress and restart with fresh URL
@@ -630,50 +1719,51 @@ class OneDriveBackup:
                                         # Break and restart with new URL
                                         break
                                     else:
-                                        print(f"  {'  ' * depth}⚠️  Could not refresh URL proactively, continuing...")
+                                        print(f"  {indent}⚠️  Could not refresh URL proactively, continuing...")
                             
                             if current_time - last_print_time >= 2 or downloaded_size >= total_size:
                                 # Calculate speed based on recent chunks for more accuracy
                                 time_delta = current_time - chunk_start_time
                                 if time_delta > 0:
-                                    recent_speed = (downloaded_size - chunk_start_size) / time_delta / (1024 * 1024)  # MB/s
+                                    recent_speed = (downloaded_size - chunk_start_size) / time_delta / one_mb  # MB/s
                                 else:
                                     recent_speed = 0
                                 
                                 percent = (downloaded_size / total_size * 100) if total_size > 0 else 0
-                                eta = (total_size - downloaded_size) / (recent_speed * 1024 * 1024) if recent_speed > 0 else 0
-                                
-                                # Format ETA nicely
-                                if eta > 3600:
-                                    eta_str = f"{eta/3600:.1f}h"
-                                elif eta > 60:
-                                    eta_str = f"{eta/60:.1f}m"
-                                else:
-                                    eta_str = f"{eta:.0f}s"
+                                eta = (total_size - downloaded_size) / (recent_speed * one_mb) if recent_speed > 0 else 0
                                 
-                                print(f"  {'  ' * depth}📥 {filename[:35]}: {downloaded_size/(1024*1024):.1f}/{total_size/(1024*1024):.1f}MB ({percent:.1f}%) @ {recent_speed:.2f}MB/s, ETA: {eta_str}     ", end='\r')
+                                # Drawn by the progress thread (see _progress_display)
+                                self.progress_state[destination] = (short_name, percent, recent_speed, self.format_eta(eta))
                                 last_print_time = current_time
                                 
                                 # Reset chunk timing for next calculation
                                 chunk_start_time = current_time
                                 chunk_start_size = downloaded_size
+                        
+                        # Flush to disk once, before the file is renamed into place
+                        if downloaded_size >= total_size:
+                            f.flush()
+                            os.fsync(f.fileno())
+                    finally:
+                        # Keep the file size equal to the bytes received so resume works
+                        f.truncate(downloaded_size)
                     
                     # If we broke out for URL refresh, continue with new URL
-                    if downloaded_size < total_size and expected_size > 10 * 1024 * 1024 * 1024:
+                    if downloaded_size < total_size and is_huge:
                         continue  # Retry with fresh URL
                 
                 # Download complete, move temp file to final location
                 if temp_file.exists():
-                    temp_file.rename(destination)
-                
-                print()  # New line after progress
+                    os.replace(temp_file, destination)
                 
-                # Verify the downloaded file
-                if not self.verify_file(destination, expected_size, item_id):
+                # Verify the downloaded file (hash was computed during the download)
+                if not self.verify_file(destination, expected_size, item_id, hasher.hexdigest(), server_hash,
+                                        server_digest(server_hasher) if server_hasher else None):
                     with self.progress_lock:
                         self.verification_failures.append(str(destination))
-                    print(f"  {'  ' * depth}⚠️  Verification failed for {filename}")
+                    print(f"  {indent}⚠️  Verification failed for {filename}")
                     # Don't return error - file is downloaded, just flagged for review
+                drop_page_cache(destination)
                 
                 # Create a success response object
                 class SuccessResponse:
@@ -684,46 +1774,117 @@ class OneDriveBackup:
             except requests.exceptions.Timeout:
                 retry_count += 1
                 if retry_count < max_retries:
-                    print(f"\n  {'  ' * depth}⏱️  Timeout for {filename}, retrying ({retry_count}/{max_retries})...")
+                    print(f"\n  {indent}⏱️  Timeout for {filename}, retrying ({retry_count}/{max_retries})...")
                     time.sleep(5)  # Wait before retry
                     continue
                 else:
-                    print(f"\n  {'  ' * depth}❌ Max retries reached for {filename}, progress saved")
+                    print(f"\n  {indent}❌ Max retries reached for {filename}, progress saved")
                     return None
                     
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+                # Reading response.raw directly raises urllib3 errors, not requests ones
                 retry_count += 1
                 if retry_count < max_retries:
-                    print(f"\n  {'  ' * depth}⚠️  Network error for {filename}, retrying ({retry_count}/{max_retries}): {e}")
+                    print(f"\n  {indent}⚠️  Network error for {filename}, retrying ({retry_count}/{max_retries}): {e}")
                     time.sleep(5)
                     continue
                 else:
-                    print(f"\n  {'  ' * depth}❌ Max retries reached for {filename}: {e}")
+                    print(f"\n  {indent}❌ Max retries reached for {filename}: {e}")
                     return None
                     
             except KeyboardInterrupt:
-                print(f"\n  {'  ' * depth}⏸️  Download interrupted for {filename}, progress saved to {temp_file.name}")
+                print(f"\n  {indent}⏸️  Download interrupted for {filename}, progress saved to {temp_file.name}")
                 raise  # Re-raise to be caught by main handler
                 
             except Exception as e:
-                print(f"\n  {'  ' * depth}❌ Error downloading {filename}: {e}")
+                print(f"\n  {indent}❌ Error downloading {filename}: {e}")
                 if temp_file.exists() and downloaded_size == 0:
                     temp_file.unlink()  # Clean up corrupted temp file only if we haven't made progress
                 return None
         
         return None  # If we exit the retry loop without success
     
+    @contextmanager
+    def _progress_display(self, interval=0.2):
+        """
+        Redraw one status line on stderr from a single background thread.
+        
+        Workers only store their numbers in progress_state/progress_summary
+        and queue finished-file lines in completed_lines, so parallel
+        downloads don't fight over the console.
+        """
+        stop = threading.Event()
+        width = max(shutil.get_terminal_size().columns - 1, 20)
+        animate = sys.stderr.isatty()  # Redirected output just gets the final status line
+        
+        def draw(status):
+            lines = [self.completed_lines.popleft() for _ in range(len(self.completed_lines))]
+            if lines:
+                if animate:
+                    sys.stderr.write('\r' + ' ' * width + '\r')
+                    sys.stderr.flush()
+                sys.stdout.write('\n'.join(lines) + '\n')
+                sys.stdout.flush()
+            if status:
+                parts = [self.progress_summary] if self.progress_summary else []
+                for name, percent, speed, eta in list(self.progress_state.values()):
+                    parts.append(f"📥 {name[:25]} {percent:.0f}% @ {speed:.1f}MB/s ETA {eta}")
+                sys.stderr.write('\r' + ' | '.join(parts)[:width].ljust(width))
+                sys.stderr.flush()
+        
+        def drawer():
+            while not stop.wait(interval):
+                draw(animate)
+        
+        thread = threading.Thread(target=drawer, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            self.progress_state.clear()
+            draw(True)
+            sys.stderr.write('\n')
+            sys.stderr.flush()
+    
+    @contextmanager
+    def _progress_writer(self, save, interval=PROGRESS_SAVE_INTERVAL):
+        """
+        Run save() from a background thread at most every interval seconds,
+        and only when workers have marked progress_dirty.
+        """
+        stop = threading.Event()
+        
+        def writer():
+            while not stop.wait(interval):
+                if not self.progress_dirty.is_set():
+                    continue
+                self.progress_dirty.clear()
+                try:
+                    save()
+                except OSError as e:
+                    print(f"\n⚠️  Could not save progress: {e}")
+        
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+    
     def get_fresh_download_url(self, item_id):
         """Get a fresh download URL for an item when the old one expires"""
         try:
             item_url = f"https://graph.microsoft.com/v1.0/me/drive/items/{item_id}"
-            response = requests.get(item_url, headers=self.api_headers, timeout=30)
+            response = self.session.get(item_url, headers=self.api_headers, timeout=30)
             
             if response.status_code == 401:
                 # Token expired, refresh and retry
                 if self.refresh_access_token():
                     self.api_headers['Authorization'] = f'Bearer {self.access_token}'
-                    response = requests.get(item_url, headers=self.api_headers, timeout=30)
+                    response = self.session.get(item_url, headers=self.api_headers, timeout=30)
             
             if response.status_code == 200:
                 item_data = response.json()
@@ -738,23 +1899,14 @@ class OneDriveBackup:
         Download a single file (used by thread pool).
         
         Args:
-            download_task: Dictionary containing file info
+            download_task: DownloadTask for the file
             
         Returns:
             dict: Result of download operation
         """
-        item = download_task['item']
-        local_path = download_task['local_path']
-        depth = download_task['depth']
-        backup_root = download_task['backup_root']
-        
-        name = item['name']
-        item_id = item['id']
-        file_size = item.get('size', 0)
-        download_url = item.get('@microsoft.graph.downloadUrl')
+        item_id, name, file_size, download_url, server_hash, local_path, depth = download_task
         
-        file_path = local_path / name
-        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path = local_path / name  # Folder was created when scan_folder visited it
         
         result = {
             'item_id': item_id,
@@ -767,15 +1919,10 @@ class OneDriveBackup:
         }
         
         # Check if we can skip this file (incremental backup)
-        if not self.should_download_file(item_id, file_size, file_path):
+        if not self.should_download_file(item_id, file_size, file_path, server_hash):
             result['skipped'] = True
             result['success'] = True
-            with self.progress_lock:
-                self.downloaded_files[item_id] = {
-                    'size': file_size,
-                    'path': str(file_path),
-                    'timestamp': datetime.now().isoformat()
-                }
+            self._record_progress(item_id, file_size, file_path)
             return result
         
         if not download_url:
@@ -785,28 +1932,47 @@ class OneDriveBackup:
         try:
             # Use chunked download for large files
             if file_size > self.large_file_threshold:
-                file_response = self.download_large_file(download_url, file_path, name, file_size, depth, item_id)
+                try:
+                    file_response = self.download_large_file(download_url, file_path, name, file_size, depth, item_id,
+                                                             server_hash)
+                finally:
+                    self.progress_state.pop(file_path, None)
             else:
-                # Small file - simple download with verification
-                file_response = requests.get(download_url, timeout=300)
+                # Small file - streamed straight to disk with verification
+                file_response = self.session.get(download_url, stream=True, timeout=DOWNLOAD_TIMEOUT)
                 
                 # If 401, the download URL expired - get a fresh one
                 if file_response.status_code == 401:
+                    file_response.close()
                     print(f"  🔄 {name}: Download URL expired, refreshing...")
                     fresh_url = self.get_fresh_download_url(item_id)
                     if fresh_url:
-                        file_response = requests.get(fresh_url, timeout=300)
+                        file_response = self.session.get(fresh_url, stream=True, timeout=DOWNLOAD_TIMEOUT)
                     else:
                         result['error'] = "Download URL expired and could not be refreshed"
                         print(f"  ❌ {name}: Could not refresh download URL")
                         return result
                 
                 if file_response.status_code == 200:
-                    with open(file_path, 'wb') as f:
-                        f.write(file_response.content)
+                    # Hash while writing so verification doesn't read the file back
+                    hasher = new_hasher(self.hash_algo)
+                    server_hasher = new_server_hasher(server_hash)
+                    buffer = memoryview(bytearray(1024 * 1024))
+                    with file_response, open(file_path, 'wb') as f:
+                        file_response.raw.decode_content = True
+                        while True:
+                            n = file_response.raw.readinto(buffer)
+                            if not n:
+                                break
+                            chunk = buffer[:n]
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            if server_hasher:
+                                server_hasher.update(chunk)
                     
                     # Verify small file
-                    if not self.verify_file(file_path, file_size, item_id):
+                    if not self.verify_file(file_path, file_size, item_id, hasher.hexdigest(), server_hash,
+                                            server_digest(server_hasher) if server_hasher else None):
                         with self.progress_lock:
                             self.verification_failures.append(str(file_path))
                         print(f"  ⚠️  Verification failed for {name}")
@@ -815,20 +1981,14 @@ class OneDriveBackup:
                 result['success'] = True
                 # Only track files with actual content
                 if file_size > 0:
-                    with self.progress_lock:
-                        self.downloaded_files[item_id] = {
-                            'size': file_size,
-                            'path': str(file_path),
-                            'timestamp': datetime.now().isoformat()
-                        }
+                    self._record_progress(item_id, file_size, file_path)
                 else:
                     print(f"  ⚠️  Skipping 0-byte file from progress: {name}")
                 
-                # Print success message
-                rel_path = file_path.relative_to(backup_root)
+                # Success message (printed with others by the progress thread, see _progress_display)
+                rel_path = file_path.relative_to(self.backup_root)
                 size_mb = file_size / (1024 * 1024)
-                with self.progress_lock:
-                    print(f"  ✓ {rel_path} ({size_mb:.1f}MB)")
+                self.completed_lines.append(f"  ✓ {rel_path} ({size_mb:.1f}MB)")
             elif file_response:
                 result['error'] = f"HTTP {file_response.status_code}"
                 print(f"  ❌ {name}: HTTP {file_response.status_code}")
@@ -840,12 +2000,218 @@ class OneDriveBackup:
         
         return result
     
+    def _record_progress(self, item_id, file_size, file_path):
+        """Mark a file as done in downloaded_files for the background progress writer"""
+        # No per-file timestamp: save_progress stamps the whole file once per save
+        entry = {'size': file_size, 'path': str(file_path)}
+        # Keep the verified digest and mtime so a resume can trust the file from a stat alone
+        metadata = self.file_metadata.get(item_id)
+        if metadata:
+            entry['mtime_ns'] = metadata.get('mtime_ns')
+            entry['hash'] = metadata.get('hash')
+        with self.progress_lock:
+            self.downloaded_files[item_id] = entry
+        self.progress_dirty.set()
+    
+    def _note_throttling(self, response, *args, **kwargs):
+        """Session response hook: report 429/503 replies to the download limiter"""
+        if response.status_code in THROTTLE_STATUSES and self.download_limiter is not None:
+            try:
+                retry_after = int(response.headers.get('Retry-After', 0))
+            except ValueError:
+                retry_after = 0  # HTTP-date form; the limiter's minimum hold applies
+            self.download_limiter.throttled(retry_after)
+    
+    def _download_worker(self, pending, results):
+        """Download thread: process (-size, sequence, task) entries from pending until a None stop marker"""
+        while True:
+            _, _, task = pending.get()
+            if task is None:
+                return
+            self.download_limiter.acquire()
+            nbytes = 0
+            try:
+                result = self.download_single_file(task)
+                if result['success'] and not result['skipped']:
+                    nbytes = task.size
+            except Exception as e:
+                result = {'name': task.name, 'path': task.local_path / task.name,
+                          'success': False, 'skipped': False, 'error': str(e)}
+            finally:
+                self.download_limiter.release(nbytes)
+            results.put(result)
+    
+    def make_api_request(self, url, retry_count=0, max_retries=3, json_body=None):
+        """Make API request with automatic token refresh (a POST if json_body is given)"""
+        try:
+            if json_body is None:
+                response = self.session.get(url, headers=self.api_headers, timeout=30)
+            else:
+                response = self.session.post(url, headers=self.api_headers, json=json_body, timeout=30)
+            
+            if response.status_code == 401:
+                if (self.refresh_token or self.msal_app) and self.consecutive_refresh_failures < 3:
+                    print("\n🔄 Access token expired, refreshing...")
+                    if self.refresh_access_token():
+                        # Update the global headers
+                        self.api_headers['Authorization'] = f'Bearer {self.access_token}'
+                        self.consecutive_refresh_failures = 0
+                        print("✓ Token refreshed, retrying request...")
+                        # Retry the request with new token
+                        return self.make_api_request(url, retry_count, max_retries, json_body)
+                    else:
+                        self.consecutive_refresh_failures += 1
+                        print(f"❌ Token refresh failed (attempt {self.consecutive_refresh_failures}/3)")
+                        if self.consecutive_refresh_failures >= 3:
+                            print("❌ Too many token refresh failures. Please re-authenticate.")
+                            return None
+                else:
+                    print("❌ Authentication failed and cannot refresh. Please re-run the script.")
+                    return None
+            
+            if response.status_code == 200:
+                self.consecutive_refresh_failures = 0  # Reset on success
+                return response
+            
+            return response
+            
+        except requests.exceptions.Timeout:
+            if retry_count < max_retries:
+                print(f"\n⏱️  Request timeout, retrying ({retry_count + 1}/{max_retries})...")
+                time.sleep(2)
+                return self.make_api_request(url, retry_count + 1, max_retries, json_body)
+            else:
+                print(f"\n❌ Max retries reached for {url[:50]}...")
+                return None
+        except requests.exceptions.RequestException as e:
+            print(f"\n❌ Network error: {e}")
+            return None
+    
+    def _fetch_pages(self, urls):
+        """
+        Fetch several Graph listing pages, in one $batch request where possible.
+        
+        Pages the batch doesn't answer (throttled, failed, or not a Graph v1.0
+        URL) are fetched on their own through make_api_request.
+        
+        Returns:
+            list: Parsed page for each URL (None if it couldn't be fetched)
+        """
+        pages = [None] * len(urls)
+        batchable = [i for i, url in enumerate(urls) if url.startswith(GRAPH_API_ROOT + '/')]
+        if len(batchable) > 1:
+            body = {'requests': [{'id': str(i), 'method': 'GET', 'url': urls[i][len(GRAPH_API_ROOT):]}
+                                 for i in batchable]}
+            response = self.make_api_request(GRAPH_BATCH_URL, json_body=body)
+            if response is not None and response.status_code == 200:
+                for reply in json_loads(response.content).get('responses', []):
+                    if reply.get('status') == 200:
+                        pages[int(reply['id'])] = reply.get('body')
+        
+        for i, url in enumerate(urls):
+            if pages[i] is None:
+                response = self.make_api_request(url)
+                if response is not None and response.status_code == 200:
+                    pages[i] = json_loads(response.content)
+        return pages
+    
+    def scan_folder(self, url, local_path, depth=0):
+        """
+        Scan a folder tree and queue files to download (with pagination support).
+        
+        Folders are listed breadth-first, up to GRAPH_BATCH_SIZE listing pages
+        per Graph $batch request, with up to SCAN_BATCH_WORKERS batches in
+        flight at once. Included files that need downloading go onto
+        download_queue as (-size, sequence, DownloadTask); counters are kept on self.
+        """
+        
+        # Listing pages still to fetch: (url, local folder, depth, page number).
+        # Large folders come back over several pages (see DRIVE_PAGE_SIZE)
+        pending = deque([(url, local_path, depth, 1)])
+        # Folders are created with their first queued file, so folders with nothing to download cost no mkdir
+        created_folders = set()
+        
+        # Only the fetches run on the pool; pages are processed here, one at a time
+        with ThreadPoolExecutor(max_workers=SCAN_BATCH_WORKERS) as pool:
+            in_flight = {}  # future -> batch of pending entries it fetches
+            while (pending or in_flight) and not self.out_of_space:
+                while pending and len(in_flight) < SCAN_BATCH_WORKERS:
+                    batch = [pending.popleft() for _ in range(min(GRAPH_BATCH_SIZE, len(pending)))]
+                    in_flight[pool.submit(self._fetch_pages, [entry[0] for entry in batch])] = batch
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = in_flight.pop(future)
+                    for (_, folder_path, folder_depth, page_count), data in zip(batch, future.result()):
+                        if data is not None and not self.out_of_space:
+                            self._scan_page(data, folder_path, folder_depth, page_count, pending, created_folders)
+    
+    def _scan_page(self, data, local_path, depth, page_count, pending, created_folders):
+        """Queue the files on one listing page and add its subfolders and next page to pending"""
+        items = data.get('value', [])
+        
+        # Queue the next page if it exists
+        next_link = data.get('@odata.nextLink')
+        if next_link:
+            pending.append((next_link, local_path, depth, page_count + 1))
+        
+        if page_count > 1:
+            print(f"  {'  ' * depth}📄 Page {page_count}: Processing {len(items)} more items in {local_path.name or 'root'}...")
+        
+        page_files = []  # Included files on this page, checked as a batch
+        extensions = self.scan_extensions
+        
+        for item in items:
+            name = item['name']
+            
+            if 'folder' in item:
+                # Listed in a later batch
+                children_url = f"{GRAPH_API_ROOT}/me/drive/items/{item['id']}/children?{CHILDREN_QUERY}"
+                pending.append((children_url, local_path / name, depth + 1, 1))
+            else:
+                # It's a file (extension sliced off the name - no Path object per item)
+                if extensions is None:
+                    page_files.append(item)
+                else:
+                    dot = name.rfind('.')
+                    if dot > 0 and name[dot:].lower() in extensions:
+                        page_files.append(item)
+        
+        # Check which files we need to download (hashing runs in parallel)
+        candidates = [(item['id'], item.get('size', 0), local_path / item['name'],
+                       server_hash_of(item))
+                      for item in page_files]
+        needs_download = self.should_download_files(candidates)
+        
+        for item, candidate, download in zip(page_files, candidates, needs_download):
+            self.scanned_files += 1
+            item_id, file_size, _, server_hash = candidate
+            
+            if download:
+                # Stop queuing once the files would no longer fit (with a 10% buffer)
+                if self.scan_space_limit and (self.total_size_bytes + file_size) * 1.1 > self.scan_space_limit:
+                    self.out_of_space = True
+                    return
+                if local_path not in created_folders:
+                    local_path.mkdir(parents=True, exist_ok=True)
+                    created_folders.add(local_path)
+                self.total_size_bytes += file_size
+                self.queued_files += 1
+                self.download_queue.put((-file_size, self.queued_files, DownloadTask(
+                    item_id, item['name'], file_size, item.get('@microsoft.graph.downloadUrl'),
+                    server_hash, local_path, depth)))
+            else:
+                self.skipped_files += 1
+    
     def download_from_api(self, destination_drive, include_docs=True, include_pics=True, include_videos=True, include_all=False, resume_backup_path=None):
         """Download files using Microsoft Graph API with multi-threading"""
         if not self.access_token:
             print("❌ Not authenticated")
             return False
         
+        # --workers threads are started; how many of them transfer at once adapts to throttling
+        self.download_limiter = DownloadLimiter(self.max_workers)
+        
         destination = Path(destination_drive)
         if not destination.exists():
             print(f"❌ Destination drive '{destination_drive}' not found!")
@@ -862,14 +2228,16 @@ class OneDriveBackup:
             backup_root.mkdir(exist_ok=True)
             print(f"\n✓ Starting new backup: {backup_root.name}")
         
+        self.backup_root = backup_root
+        
         # Load metadata for incremental backup
         self.load_metadata(backup_root)
         
         # Progress tracking
         self.progress_file = backup_root / ".progress.json"
         if self.progress_file.exists():
-            with open(self.progress_file, 'r') as f:
-                progress_data = json.load(f)
+            with open(self.progress_file, 'rb') as f:
+                progress_data = json_loads(f.read())
                 raw_downloaded = progress_data.get('downloaded_files', {})
             
             # Cleanse progress: Remove 0-byte entries
@@ -893,203 +2261,112 @@ class OneDriveBackup:
         # Create headers dict that we can update when refreshing tokens
         self.api_headers = {'Authorization': f'Bearer {self.access_token}'}
         
-        # PHASE 1: Scan and calculate total size
-        print("🔍 Phase 1: Scanning OneDrive and calculating space requirements...\n")
-        
-        graph_url = "https://graph.microsoft.com/v1.0/me/drive/root/children"
-        
-        doc_extensions = {'.pdf', '.docx', '.doc', '.txt', '.xlsx', '.xls', 
-                         '.pptx', '.ppt', '.odt', '.rtf', '.csv'}
-        pic_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', 
-                         '.svg', '.webp', '.heic', '.raw'}
-        video_extensions = {'.mov', '.mp4', '.avi', '.mkv', '.wmv', '.flv', 
-                           '.m4v', '.mpg', '.mpeg', '.3gp', '.webm'}
-        
-        total_size_bytes = 0
-        files_to_download = []
-        scanned_files = 0
-        skipped_files = 0
-        consecutive_refresh_failures = 0
-        
-        def make_api_request(url, retry_count=0, max_retries=3):
-            """Make API request with automatic token refresh"""
-            nonlocal consecutive_refresh_failures
-            
-            try:
-                response = requests.get(url, headers=self.api_headers, timeout=30)
-                
-                if response.status_code == 401:
-                    if self.refresh_token and consecutive_refresh_failures < 3:
-                        print("\n🔄 Access token expired, refreshing...")
-                        if self.refresh_access_token():
-                            # Update the global headers
-                            self.api_headers['Authorization'] = f'Bearer {self.access_token}'
-                            consecutive_refresh_failures = 0
-                            print("✓ Token refreshed, retrying request...")
-                            # Retry the request with new token
-                            return make_api_request(url, retry_count, max_retries)
-                        else:
-                            consecutive_refresh_failures += 1
-                            print(f"❌ Token refresh failed (attempt {consecutive_refresh_failures}/3)")
-                            if consecutive_refresh_failures >= 3:
-                                print("❌ Too many token refresh failures. Please re-authenticate.")
-                                return None
-                    else:
-                        print("❌ Authentication failed and cannot refresh. Please re-run the script.")
-                        return None
-                
-                if response.status_code == 200:
-                    consecutive_refresh_failures = 0  # Reset on success
-                    return response
-                
-                return response
-                
-            except requests.exceptions.Timeout:
-                if retry_count < max_retries:
-                    print(f"\n⏱️  Request timeout, retrying ({retry_count + 1}/{max_retries})...")
-                    time.sleep(2)
-                    return make_api_request(url, retry_count + 1, max_retries)
-                else:
-                    print(f"\n❌ Max retries reached for {url[:50]}...")
-                    return None
-            except requests.exceptions.RequestException as e:
-                print(f"\n❌ Network error: {e}")
-                return None
-        
-        def scan_folder(url, local_path, depth=0):
-            """Scan folder and collect files to download (with pagination support)"""
-            nonlocal total_size_bytes, scanned_files, skipped_files
-            
-            # Handle pagination - Microsoft Graph API returns max 200 items per page
-            current_url = url
-            page_count = 0
-            
-            while current_url:
-                page_count += 1
-                
-                response = make_api_request(current_url)
-                if response is None or response.status_code != 200:
-                    return
-                
-                data = response.json()
-                items = data.get('value', [])
-                
-                # Check for next page
-                next_link = data.get('@odata.nextLink')
-                
-                if page_count > 1:
-                    print(f"  {'  ' * depth}📄 Page {page_count}: Processing {len(items)} more items in {local_path.name or 'root'}...")
-                
-                for item in items:
-                    name = item['name']
-                    item_id = item['id']
-                    
-                    if 'folder' in item:
-                        # Recurse into folder
-                        new_local_path = local_path / name
-                        new_local_path.mkdir(exist_ok=True, parents=True)
-                        children_url = f"https://graph.microsoft.com/v1.0/me/drive/items/{item_id}/children"
-                        scan_folder(children_url, new_local_path, depth + 1)
-                    else:
-                        # It's a file
-                        ext = Path(name).suffix.lower()
-                        should_include = False
-                        
-                        if include_all:
-                            should_include = True
-                        elif include_docs and ext in doc_extensions:
-                            should_include = True
-                        elif include_pics and ext in pic_extensions:
-                            should_include = True
-                        elif include_videos and ext in video_extensions:
-                            should_include = True
-                        
-                        if should_include:
-                            scanned_files += 1
-                            file_size = item.get('size', 0)
-                            file_path = local_path / name
-                            
-                            # Check if we need to download this file
-                            if self.should_download_file(item_id, file_size, file_path):
-                                total_size_bytes += file_size
-                                files_to_download.append({
-                                    'item': item,
-                                    'local_path': local_path,
-                                    'depth': depth,
-                                    'backup_root': backup_root
-                                })
-                            else:
-                                skipped_files += 1
-                            
-                            if scanned_files % 100 == 0:
-                                print(f"  Scanned: {scanned_files} files, Need to download: {len(files_to_download)} ({self.format_size(total_size_bytes)})", end='\r')
-                
-                # Move to next page if it exists
-                current_url = next_link
-        
-        # Start scanning
-        scan_folder(graph_url, backup_root)
-        
-        print(f"\n\n✓ Scan complete!")
-        print(f"  Total files found: {scanned_files}")
-        print(f"  Files to download: {len(files_to_download)}")
-        print(f"  Files skipped (unchanged): {skipped_files}")
-        print(f"  Size to download: {self.format_size(total_size_bytes)}\n")
-        
-        # PHASE 2: Check disk space
-        print("💾 Phase 2: Checking available disk space...\n")
-        
-        has_space, available, required = self.check_disk_space(destination, total_size_bytes)
-        
-        print(f"  Available space: {self.format_size(available)}")
-        print(f"  Required space: {self.format_size(required)} (including 10% buffer)")
-        
-        if not has_space:
-            print(f"\n❌ ERROR: Insufficient disk space!")
-            print(f"  Need: {self.format_size(required - available)} more")
-            print(f"\nOptions:")
-            print(f"  1. Free up space on {destination}")
-            print(f"  2. Use a different destination drive")
-            print(f"  3. Select fewer file types to backup")
-            return False
-        
-        print(f"  ✓ Sufficient space available\n")
-        
-        if len(files_to_download) == 0:
-            print("✅ All files are up to date! No downloads needed.")
-            return True
-        
-        # PHASE 3: Download files with multi-threading
-        print(f"📥 Phase 3: Downloading {len(files_to_download)} files using {self.max_workers} parallel threads...\n")
+        # PHASE 1: Check disk space (the scan stops queuing files that would no longer fit)
+        print("💾 Phase 1: Checking available disk space...\n")
+        
+        _, available, _ = self.check_disk_space(destination, 0)
+        print(f"  Available space: {self.format_size(available)}\n")
+        
+        graph_url = f"{GRAPH_API_ROOT}/me/drive/root/children?{CHILDREN_QUERY}"
+        
+        # One set lookup per file instead of a branch per category
+        allowed_extensions = set()
+        if include_docs:
+            allowed_extensions |= DOC_EXTENSIONS
+        if include_pics:
+            allowed_extensions |= PIC_EXTENSIONS
+        if include_videos:
+            allowed_extensions |= VIDEO_EXTENSIONS
+        
+        # Scan settings and counters (see scan_folder)
+        self.scan_extensions = None if include_all else allowed_extensions
+        self.scan_space_limit = available
+        self.total_size_bytes = 0
+        self.queued_files = 0
+        self.scanned_files = 0
+        self.skipped_files = 0
+        self.out_of_space = False
+        self.consecutive_refresh_failures = 0
+        scan_done = False
+        scan_error = None
+        
+        # Workers take the largest queued file first, so a big file found late doesn't tail the run
+        pending = self.download_queue = queue.PriorityQueue()  # (-size, sequence, DownloadTask)
+        results = queue.Queue()
+        
+        # PHASE 2: Scan OneDrive and download at the same time
+        print(f"📥 Phase 2: Scanning OneDrive and downloading new files using {self.max_workers} parallel threads...\n")
         
         downloaded_count = 0
         skipped_count = 0
         failed_count = 0
         failed_files = []  # Track failed files with reasons
         
-        def save_progress():
+        save_lock = Lock()  # Background writer and interrupt handlers share the temp file
+        last_snapshot = time.time()
+        
+        def save_progress(final=False, snapshot=True):
             """Save current progress (thread-safe)"""
-            # Create a snapshot while holding the lock to avoid "dictionary changed size during iteration"
-            with self.progress_lock:
-                files_snapshot = dict(self.downloaded_files)
-            
-            # Write snapshot to file (no lock needed for file I/O)
-            with open(self.progress_file, 'w') as f:
-                json.dump({
-                    'downloaded_files': files_snapshot,
-                    'timestamp': datetime.now().isoformat()
-                }, f)
-            self.save_metadata()
+            nonlocal last_snapshot
+            with save_lock:
+                if snapshot:
+                    # Create a snapshot while holding the lock to avoid "dictionary changed size during iteration"
+                    with self.progress_lock:
+                        files_snapshot = dict(self.downloaded_files)
+                    
+                    # Write to a temp file and swap it in, so a crash never leaves a torn progress file
+                    tmp_file = self.progress_file.with_name(self.progress_file.name + '.tmp')
+                    with open(tmp_file, 'wb') as f:
+                        f.write(json_dumps({
+                            'downloaded_files': files_snapshot,
+                            'timestamp': datetime.now().isoformat()
+                        }))
+                    os.replace(tmp_file, self.progress_file)
+                    last_snapshot = time.time()
+                self.save_metadata(compact=final)
+        
+        def periodic_save():
+            """Append to the metadata journal every pass, rewrite the whole progress file less often"""
+            save_progress(snapshot=time.time() - last_snapshot >= PROGRESS_SNAPSHOT_INTERVAL)
         
         try:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Submit all download tasks
-                future_to_file = {executor.submit(self.download_single_file, task): task for task in files_to_download}
-                
-                # Process completed downloads
-                for future in as_completed(future_to_file):
-                    task = future_to_file[future]
-                    result = future.result()
+            # Long-lived workers pull from the queue the scan fills, instead of one Future per file
+            workers = [threading.Thread(target=self._download_worker, args=(pending, results), daemon=True)
+                       for _ in range(self.max_workers)]
+            # Workers only wait on sockets, so a small stack keeps high --workers counts cheap
+            default_stack = threading.stack_size(DOWNLOAD_THREAD_STACK_SIZE)
+            try:
+                for worker in workers:
+                    worker.start()
+            finally:
+                threading.stack_size(default_stack)
+            
+            def scan():
+                """Scan thread: queue files for the workers as each page is checked"""
+                nonlocal scan_done, scan_error
+                try:
+                    self.scan_folder(graph_url, backup_root)
+                except Exception as e:
+                    scan_error = e
+                finally:
+                    # Hash checks are done; free the worker processes
+                    if self.hash_pool is not None:
+                        self.hash_pool.shutdown()
+                        self.hash_pool = None
+                    for i in range(len(workers)):
+                        pending.put((float('inf'), i, None))  # One stop marker per worker, sorted last
+                    scan_done = True
+            
+            threading.Thread(target=scan, daemon=True).start()
+            
+            # Progress is saved by a background writer, not on every result
+            with self._progress_display(), self._progress_writer(periodic_save):
+                # Process completed downloads until the scan is over and every queued file is done
+                while not scan_done or downloaded_count + skipped_count + failed_count < self.queued_files:
+                    try:
+                        result = results.get(timeout=1)  # Timeout keeps Ctrl+C responsive on Windows
+                    except queue.Empty:
+                        continue
                     
                     if result['success']:
                         if result['skipped']:
@@ -1105,24 +2382,42 @@ class OneDriveBackup:
                             'error': result.get('error', 'Unknown error')
                         })
                     
-                    # Save progress every 10 files
-                    if (downloaded_count + skipped_count + failed_count) % 10 == 0:
-                        save_progress()
-                    
                     # Show progress
                     total_processed = downloaded_count + skipped_count + failed_count
-                    print(f"  Progress: {total_processed}/{len(files_to_download)} (Downloaded: {downloaded_count}, Skipped: {skipped_count}, Failed: {failed_count})", end='\r')
+                    scanning = "" if scan_done else f"Scanned: {self.scanned_files}, "
+                    self.progress_summary = f"  {scanning}Progress: {total_processed}/{self.queued_files} (Downloaded: {downloaded_count}, Skipped: {skipped_count}, Failed: {failed_count})"
             
-            print()  # New line after progress
+            if scan_error is not None:
+                raise scan_error
             
             # Final save
-            save_progress()
+            save_progress(final=True)
+            
+            print(f"\n✓ Scan complete!")
+            print(f"  Total files found: {self.scanned_files}")
+            print(f"  Files skipped (unchanged): {self.skipped_files}")
+            print(f"  Size downloaded: {self.format_size(self.total_size_bytes)}")
+            
+            if self.out_of_space:
+                print(f"\n❌ ERROR: Insufficient disk space!")
+                print(f"  The scan stopped after {self.queued_files} files ({self.format_size(self.total_size_bytes)});")
+                print(f"  the next file would not fit in {self.format_size(available)} (including 10% buffer).")
+                print(f"\nOptions:")
+                print(f"  1. Free up space on {destination}")
+                print(f"  2. Use a different destination drive")
+                print(f"  3. Select fewer file types to backup")
+                print(f"\nProgress saved. Run the script again to continue once there is room.")
+                return False
+            
+            if self.queued_files == 0:
+                print("\n✅ All files are up to date! No downloads needed.")
+                return True
             
             # Print summary
             print("\n" + "="*50)
             print("📊 BACKUP SUMMARY")
             print("="*50)
-            print(f"Total files processed: {len(files_to_download)}")
+            print(f"Total files processed: {self.queued_files}")
             print(f"Successfully downloaded: {downloaded_count}")
             print(f"Skipped (unchanged): {skipped_count}")
             print(f"Failed: {failed_count}")
@@ -1241,43 +2536,64 @@ class OneDriveBackup:
             return {'success': False, 'failed_count': failed_count, 'downloaded_count': downloaded_count}
     
     def get_documents_and_pictures(self):
-        """Find all documents and pictures in OneDrive"""
+        """
+        Find all documents and pictures in OneDrive.
+        
+        Returns:
+            tuple: (documents, pictures), each a list of (path string, os.stat_result)
+        """
         if not self.onedrive_path:
             return [], []
         
-        doc_extensions = {'.pdf', '.docx', '.doc', '.txt', '.xlsx', '.xls', 
-                         '.pptx', '.ppt', '.odt', '.rtf', '.csv'}
-        pic_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', 
-                         '.svg', '.webp', '.heic', '.raw'}
-        
         documents = []
         pictures = []
+        # Extension -> result list, so each file is sorted with a single lookup
+        found_by_ext = dict.fromkeys(DOC_EXTENSIONS, documents)
+        found_by_ext.update(dict.fromkeys(PIC_EXTENSIONS, pictures))
         
         print("🔍 Scanning OneDrive for files...")
         folder_count = 0
         skipped_online_only = 0
+        next_report = 0.0  # Status line is redrawn at most every SCAN_REPORT_INTERVAL seconds
         
-        for root, dirs, files in os.walk(self.onedrive_path):
+        # scandir reports entry types from the directory listing itself, so only
+        # matching files are stat'ed - once, with the result kept for the copy
+        folders = [str(self.onedrive_path)]
+        while folders:
+            folder = folders.pop()
             folder_count += 1
-            if folder_count % 10 == 0:
+            now = time.monotonic()
+            if now >= next_report:
+                next_report = now + SCAN_REPORT_INTERVAL
                 print(f"   Scanned {folder_count} folders, found {len(documents)} docs, {len(pictures)} pics...", end='\r')
             
-            for file in files:
-                file_path = Path(root) / file
-                ext = file_path.suffix.lower()
-                
-                # Skip files that are online-only (0 bytes or have cloud icon attributes)
-                try:
-                    if file_path.stat().st_size == 0:
-                        skipped_online_only += 1
+            try:
+                entries = os.scandir(folder)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink():  # Like os.walk, don't follow folder links
+                                folders.append(entry.path)
+                            continue
+                        
+                        name = entry.name
+                        dot = name.rfind('.')
+                        found = found_by_ext.get(name[dot:].lower() if dot > 0 else '')
+                        if found is None:
+                            continue
+                        
+                        # Skip files that are online-only (0 bytes or have cloud icon attributes)
+                        file_stat = entry.stat()
+                        if file_stat.st_size == 0:
+                            skipped_online_only += 1
+                            continue
+                    except OSError:
                         continue
-                except:
-                    continue
-                
-                if ext in doc_extensions:
-                    documents.append(file_path)
-                elif ext in pic_extensions:
-                    pictures.append(file_path)
+                    
+                    found.append((entry.path, file_stat))
         
         print(f"\n✓ Scan complete! Found {len(documents)} documents and {len(pictures)} pictures")
         if skipped_online_only > 0:
@@ -1289,8 +2605,139 @@ class OneDriveBackup:
             print()
         return documents, pictures
     
-    def backup_files(self, destination_drive, include_docs=True, include_pics=True):
-        """Backup files to external drive"""
+    def _needs_copy(self, src_stat, dest_file):
+        """False if dest_file is an earlier copy of the source file (same size and modified time)"""
+        try:
+            dest_stat = os.stat(dest_file)
+        except FileNotFoundError:
+            return True
+        # The copy carries the mtime over; FAT32 only stores it to 2 seconds, so allow that much
+        return (src_stat.st_size != dest_stat.st_size
+                or abs(src_stat.st_mtime - dest_stat.st_mtime) > MTIME_TOLERANCE)
+    
+    def _verify_copy(self, src, src_stat, dest_file):
+        """
+        Check a finished local copy. Every copy is size-checked; a small sample
+        and all very large files are also hashed on both sides.
+        
+        A copy that fails the check is deleted, since it already has the source's
+        size and mtime and _needs_copy would otherwise skip it on every later run.
+        
+        Returns:
+            str: 'size' or 'hash' (the check that was made)
+        """
+        if os.stat(dest_file).st_size != src_stat.st_size:
+            error = "Size mismatch after copy"
+        elif src_stat.st_size < DEEP_VERIFY_MIN_SIZE and random.random() >= VERIFY_SAMPLE_RATE:
+            return 'size'
+        else:
+            src_hash = hash_file(src, algorithm=self.hash_algo)
+            dest_hash = hash_file(dest_file, algorithm=self.hash_algo)
+            if src_hash is None or dest_hash is None:
+                error = "Could not hash copy to verify it"  # hash_file returns None on read errors
+            elif src_hash != dest_hash:
+                error = "Hash mismatch after copy"
+            else:
+                return 'hash'
+        
+        try:
+            os.remove(dest_file)
+        except OSError:
+            pass
+        raise IOError(error)
+    
+    def _copy_one(self, src, src_stat, dest_file):
+        """Copy one file for backup_files; returns its backup log entry"""
+        try:
+            if not self._needs_copy(src_stat, dest_file):
+                return {
+                    'file': str(src),
+                    'destination': str(dest_file),
+                    'status': 'skipped'
+                }
+            fast_copy(src, dest_file, self.preserve_metadata)
+            verified = self._verify_copy(src, src_stat, dest_file)
+            return {
+                'file': str(src),
+                'destination': str(dest_file),
+                'status': 'success',
+                'verified': verified
+            }
+        except Exception as e:
+            return {
+                'file': str(src),
+                'status': 'failed',
+                'error': str(e)
+            }
+    
+    def _copy_files(self, groups, failed_files, log):
+        """
+        Copy each group of files under its destination folder (keeping their
+        OneDrive-relative paths) using one pool of copy_workers threads.
+        
+        Args:
+            groups: (files, dest_folder) pairs, where files are the (path string, stat)
+                pairs from get_documents_and_pictures
+            failed_files: List the first FAILED_FILES_SHOWN (path, error) tuples are appended to
+            log: Binary file each file's log entry is written to as a JSON line
+            
+        Returns:
+            tuple: (files copied, files skipped as unchanged, files failed)
+        """
+        copied = 0
+        skipped = 0
+        failed = 0
+        # Sources all start with the OneDrive folder, so relative paths are plain string slices
+        prefix_len = len(os.path.join(os.fspath(self.onedrive_path), ''))
+        jobs = []
+        for files, dest_folder in groups:
+            dest_root = os.fspath(dest_folder)
+            jobs += [(src, src_stat, os.path.join(dest_root, src[prefix_len:])) for src, src_stat in files]
+        if self.hdd_optimize:
+            # Inode order roughly follows the on-disk layout, so a spinning source reads mostly
+            # sequentially. Where scandir reports no inode (Windows) this sorts by folder instead
+            jobs.sort(key=lambda job: (job[1].st_dev, job[1].st_ino, job[0]))
+        
+        # Create each destination folder once, parents first, instead of once per file
+        for folder in sorted({os.path.dirname(job[2]) for job in jobs}, key=lambda path: path.count(os.sep)):
+            try:
+                os.makedirs(folder, exist_ok=True)
+            except OSError:
+                pass  # Its files fail to copy and are reported with the error
+        
+        # All groups share one pool so it stays busy across the documents/pictures boundary.
+        # Copies spend their time in read/write syscalls, which release the GIL.
+        # Progress is only stored here and drawn a few times a second (see _progress_display)
+        with ThreadPoolExecutor(max_workers=self.copy_workers) as pool, self._progress_display():
+            # Per-file loop: bind the names it uses to locals
+            copy_one = self._copy_one
+            futures = {pool.submit(copy_one, *job): job[0] for job in jobs}
+            write = log.write
+            basename = os.path.basename
+            total = len(jobs)
+            for idx, future in enumerate(as_completed(futures), 1):
+                # Forget finished futures so their log entries don't pile up until the pool is done
+                src = futures.pop(future)
+                name = basename(src)
+                entry = future.result()
+                write(json_dumps(entry) + b'\n')
+                status = entry['status']
+                if status == 'success':
+                    copied += 1
+                    self.progress_summary = f"  [{idx}/{total}] ✓ {name[:50]}"
+                elif status == 'skipped':
+                    skipped += 1
+                    self.progress_summary = f"  [{idx}/{total}] = {name[:50]} (unchanged)"
+                else:
+                    failed += 1
+                    if len(failed_files) < FAILED_FILES_SHOWN:
+                        failed_files.append((src, entry['error']))
+                    self.completed_lines.append(f"  [{idx}/{total}] ✗ {name}: {entry['error']}")
+        self.progress_summary = ''
+        return copied, skipped, failed
+    
+    def backup_files(self, destination_drive, include_docs=True, include_pics=True, resume_backup_path=None):
+        """Backup files to external drive (into resume_backup_path to only copy new or changed files)"""
         if not self.onedrive_path:
             print("❌ OneDrive folder not found!")
             print("Please ensure OneDrive is installed and synced.")
@@ -1301,10 +2748,14 @@ class OneDriveBackup:
             print(f"❌ Destination drive '{destination_drive}' not found!")
             return False
         
-        # Create backup folder with timestamp
+        # Create backup folder with timestamp (or update an earlier backup in place)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_root = destination / f"OneDrive_Backup_{timestamp}"
-        backup_root.mkdir(exist_ok=True)
+        if resume_backup_path:
+            backup_root = resume_backup_path
+            print(f"\n✓ Updating backup: {backup_root.name} (unchanged files are skipped)")
+        else:
+            backup_root = destination / f"OneDrive_Backup_{timestamp}"
+            backup_root.mkdir(exist_ok=True)
         
         print(f"\n📁 OneDrive location: {self.onedrive_path}")
         print(f"💾 Backup destination: {backup_root}\n")
@@ -1313,82 +2764,42 @@ class OneDriveBackup:
         
         total_files = 0
         copied_files = 0
+        skipped_files = 0
+        failed_count = 0
+        # Only the first few failures (usually the root cause) are kept for the summary;
+        # all of them are in backup_log.jsonl
         failed_files = []
         
-        # Backup documents
+        # Per-file entries are written as they complete instead of being kept until the end
+        files_log = backup_root / "backup_log.jsonl"
+        groups = []
         if include_docs and documents:
             print(f"📄 Backing up {len(documents)} documents...")
-            docs_folder = backup_root / "Documents"
-            docs_folder.mkdir(exist_ok=True)
-            
-            for idx, doc in enumerate(documents, 1):
-                total_files += 1
-                try:
-                    relative_path = doc.relative_to(self.onedrive_path)
-                    dest_file = docs_folder / relative_path
-                    dest_file.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    shutil.copy2(doc, dest_file)
-                    copied_files += 1
-                    self.backup_log.append({
-                        'file': str(doc),
-                        'destination': str(dest_file),
-                        'status': 'success'
-                    })
-                    # Show progress every file
-                    print(f"  [{idx}/{len(documents)}] ✓ {relative_path.name[:50]}", end='\r')
-                except Exception as e:
-                    failed_files.append((doc, str(e)))
-                    self.backup_log.append({
-                        'file': str(doc),
-                        'status': 'failed',
-                        'error': str(e)
-                    })
-                    print(f"  [{idx}/{len(documents)}] ✗ {doc.name}: {e}")
-            print()  # New line after progress
-        
-        # Backup pictures
+            groups.append((documents, backup_root / "Documents"))
         if include_pics and pictures:
-            print(f"\n🖼️  Backing up {len(pictures)} pictures...")
-            pics_folder = backup_root / "Pictures"
-            pics_folder.mkdir(exist_ok=True)
-            
-            for idx, pic in enumerate(pictures, 1):
-                total_files += 1
-                try:
-                    relative_path = pic.relative_to(self.onedrive_path)
-                    dest_file = pics_folder / relative_path
-                    dest_file.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    shutil.copy2(pic, dest_file)
-                    copied_files += 1
-                    self.backup_log.append({
-                        'file': str(pic),
-                        'destination': str(dest_file),
-                        'status': 'success'
-                    })
-                    # Show progress every file
-                    print(f"  [{idx}/{len(pictures)}] ✓ {relative_path.name[:50]}", end='\r')
-                except Exception as e:
-                    failed_files.append((pic, str(e)))
-                    self.backup_log.append({
-                        'file': str(pic),
-                        'status': 'failed',
-                        'error': str(e)
-                    })
-                    print(f"  [{idx}/{len(pictures)}] ✗ {pic.name}: {e}")
-            print()  # New line after progress
-        
-        # Save backup log
+            print(f"🖼️  Backing up {len(pictures)} pictures...")
+            groups.append((pictures, backup_root / "Pictures"))
+        
+        with open(files_log, 'ab') as log:
+            if groups:
+                total_files = sum(len(files) for files, _ in groups)
+                copied_files, skipped_files, failed_count = self._copy_files(groups, failed_files, log)
+            log.flush()
+            os.fsync(log.fileno())
+        
+        # Save backup log summary (synced so it survives the drive being unplugged right after)
         log_file = backup_root / "backup_log.json"
-        with open(log_file, 'w') as f:
-            json.dump({
+        with open(log_file, 'wb') as f:
+            f.write(json_dumps({
                 'timestamp': timestamp,
                 'total_files': total_files,
                 'copied_files': copied_files,
-                'failed_files': len(failed_files),
-                'files': self.backup_log
-            }, f, indent=2)
+                'skipped_files': skipped_files,
+                'failed_files': failed_count,
+                'files_log': files_log.name
+            }))
+            f.flush()
+            os.fsync(f.fileno())
         
         # Print summary
         print("\n" + "="*50)
@@ -1396,31 +2807,55 @@ class OneDriveBackup:
         print("="*50)
         print(f"Total files found: {total_files}")
         print(f"Successfully copied: {copied_files}")
-        print(f"Failed: {len(failed_files)}")
+        print(f"Skipped (unchanged): {skipped_files}")
+        print(f"Failed: {failed_count}")
         print(f"Backup location: {backup_root}")
-        print(f"Log file: {log_file}")
+        print(f"Log file: {log_file} (per-file entries in {files_log.name})")
         
         if failed_files:
             print("\n⚠️  Failed files:")
-            for file, error in failed_files[:10]:
-                print(f"  - {file.name}: {error}")
-            if len(failed_files) > 10:
-                print(f"  ... and {len(failed_files) - 10} more")
+            for file, error in failed_files:
+                print(f"  - {os.path.basename(file)}: {error}")
+            if failed_count > len(failed_files):
+                print(f"  ... and {failed_count - len(failed_files)} more (see {files_log.name})")
         
         return True
 
 def main():
+    parser = argparse.ArgumentParser(description='OneDrive Backup Tool - Enhanced Edition')
+    parser.add_argument('--workers', type=int, default=DEFAULT_DOWNLOAD_WORKERS,
+                        help=f'Parallel downloads (default: {DEFAULT_DOWNLOAD_WORKERS})')
+    parser.add_argument('--copy-workers', type=int, default=DEFAULT_COPY_WORKERS,
+                        help=f'Parallel copies when backing up the local OneDrive folder (default: {DEFAULT_COPY_WORKERS})')
+    parser.add_argument('--hdd-optimize', action='store_true',
+                        help='Copy local files in on-disk order (faster when the OneDrive folder is on a hard disk)')
+    parser.add_argument('--no-preserve-metadata', dest='preserve_metadata', action='store_false',
+                        help='Only copy file contents and timestamps when backing up the local OneDrive folder')
+    parser.add_argument('--paranoid', action='store_true',
+                        help='Re-hash existing files even if size and modified time are unchanged')
+    parser.add_argument('--hash-algo', choices=('auto',) + HASH_ALGOS, default='auto',
+                        help='Local integrity hash (default auto: sha256 on CPUs with SHA '
+                             'instructions, else xxh3/blake3 if installed; use sha256 for audit-grade checks)')
+    args = parser.parse_args()
+    
     print("="*50)
     print("OneDrive Backup Tool - Enhanced Edition")
     print("="*50)
     print("\n🚀 Features:")
-    print("  ✓ Multi-threaded downloads (3x faster)")
+    print("  ✓ Multi-threaded downloads")
     print("  ✓ Disk space verification")
     print("  ✓ File integrity verification")
     print("  ✓ Incremental backups (skip unchanged files)")
     print("  ✓ Resume capability")
     
     backup = OneDriveBackup()
+    backup.max_workers = max(1, args.workers)
+    backup.size_connection_pool()
+    backup.copy_workers = max(1, args.copy_workers)
+    backup.hdd_optimize = args.hdd_optimize
+    backup.preserve_metadata = args.preserve_metadata
+    backup.paranoid = args.paranoid
+    backup.hash_algo = resolve_hash_algo(args.hash_algo)
     
     # Always give user the choice
     if backup.onedrive_path:
@@ -1474,8 +2909,12 @@ def main():
         return
     
     # Check for existing backups and ask user BEFORE asking what to backup
-    existing_backups = sorted([d for d in destination_path.glob("OneDrive_Backup_*") if d.is_dir()], 
-                             key=lambda x: x.stat().st_mtime, reverse=True)
+    # One directory scan; the entries' cached stat gives the sort key
+    with os.scandir(destination_path) as it:
+        entries = [entry for entry in it
+                   if entry.name.startswith("OneDrive_Backup_") and entry.is_dir(follow_symlinks=False)]
+    entries.sort(key=lambda entry: entry.stat(follow_symlinks=False).st_mtime, reverse=True)
+    existing_backups = [Path(entry.path) for entry in entries]
     
     resume_backup_path = None
     if existing_backups:
@@ -1486,17 +2925,13 @@ def main():
             
             if progress_file.exists():
                 try:
-                    with open(progress_file, 'r') as f:
-                        progress_data = json.load(f)
-                        file_count = len(progress_data.get('downloaded_files', {}))
+                    file_count = count_json_entries(progress_file, 'downloaded_files')
                     print(f"  {i}. {backup_dir.name} ({file_count} files already downloaded) - INCOMPLETE")
                 except:
                     print(f"  {i}. {backup_dir.name} (progress file exists)")
             elif metadata_file.exists():
                 try:
-                    with open(metadata_file, 'r') as f:
-                        metadata = json.load(f)
-                        file_count = len(metadata.get('files', {}))
+                    file_count = count_json_entries(metadata_file, 'files')
                     print(f"  {i}. {backup_dir.name} ({file_count} files) - COMPLETE")
                 except:
                     print(f"  {i}. {backup_dir.name}")
@@ -1542,7 +2977,7 @@ def main():
         if backup.use_api:
             result = backup.download_from_api(destination, include_docs, include_pics, include_videos, include_all, resume_backup_path)
         else:
-            result = backup.backup_files(destination, include_docs, include_pics)
+            result = backup.backup_files(destination, include_docs, include_pics, resume_backup_path)
             result = {'success': True, 'failed_count': 0, 'downloaded_count': 0}  # Local backup doesn't track failures the same way
         
         # Check if any files failed
@@ -1567,4 +3002,5 @@ def main():
     print("\n✅ Backup complete!")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Needed for the hash process pool in frozen .exe builds
     main()
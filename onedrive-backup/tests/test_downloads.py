@@ -0,0 +1,197 @@
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import onedrive_backup_enhanced as backup
+from onedrive_backup_enhanced import DownloadLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class DownloadLimiterTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(backup.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_throttled_lowers_limit_once_per_burst(self):
+        limiter = DownloadLimiter(4)
+        limiter.throttled()
+        limiter.throttled()
+        self.assertEqual(limiter.limit, 3)
+        self.clock.now += 1
+        limiter.throttled()
+        self.assertEqual(limiter.limit, 2)
+
+    def test_limit_never_below_one(self):
+        limiter = DownloadLimiter(2)
+        for _ in range(5):
+            limiter.throttled()
+            self.clock.now += 1
+        self.assertEqual(limiter.limit, 1)
+
+    def test_raises_again_after_hold(self):
+        limiter = DownloadLimiter(4)
+        limiter.throttled(retry_after=30)
+        self.assertEqual(limiter.limit, 3)
+
+        limiter.acquire()
+        self.clock.now += backup.WORKER_TUNE_INTERVAL
+        limiter.release(1000)
+        self.assertEqual(limiter.limit, 3)  # Still holding off after Retry-After
+
+        limiter.acquire()
+        self.clock.now += 30
+        limiter.release(1000)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_takes_back_raise_that_did_not_help(self):
+        limiter = DownloadLimiter(4)
+        limiter.throttled()
+        self.clock.now += backup.WORKER_TUNE_INTERVAL
+        limiter.acquire()
+        limiter.release(10000)
+        self.assertEqual(limiter.limit, 4)
+
+        limiter.acquire()
+        self.clock.now += backup.WORKER_TUNE_INTERVAL
+        limiter.release(10)  # Slower than the last window
+        self.assertEqual(limiter.limit, 3)
+
+    def test_acquire_waits_for_free_slot(self):
+        limiter = DownloadLimiter(1)
+        limiter.acquire()
+        acquired = threading.Event()
+
+        def worker():
+            limiter.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        self.assertFalse(acquired.wait(0.2))
+        limiter.release()
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+        self.assertEqual(limiter.active, 1)
+
+
+class RangeResponse:
+    def __init__(self, data, status_code):
+        self.status_code = status_code
+        self.raw = io.BytesIO(data)
+        self.headers = {'content-length': str(len(data))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.raw.close()
+
+
+class RangeSession:
+    """Serves byte ranges of one file and records the ranges asked for"""
+
+    def __init__(self, data):
+        self.data = data
+        self.ranges = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, **kwargs):
+        start, end = headers['Range'][len('bytes='):].split('-')
+        start, end = int(start), int(end) + 1
+        with self.lock:
+            self.ranges.append((start, end))
+        return RangeResponse(self.data[start:end], 206)
+
+
+class SegmentedResumeTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dest = Path(self._tmp.name) / 'big.bin'
+        self.part_file = self.dest.parent / '.big.bin.parts'
+        self.state_file = self.dest.parent / '.big.bin.parts.json'
+        self.data = os.urandom(4 * 1024 * 1024 + 11)
+        self.app = backup.OneDriveBackup()
+        self.app.session = RangeSession(self.data)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def download(self):
+        return self.app._download_segmented('url', self.dest, 'big.bin', len(self.data), item_id='id')
+
+    def test_fresh_download(self):
+        self.assertEqual(self.download().status_code, 200)
+        self.assertEqual(self.dest.read_bytes(), self.data)
+        self.assertFalse(self.part_file.exists())
+        self.assertFalse(self.state_file.exists())
+        self.assertEqual(self.app.file_metadata['id']['hash'], hashlib.sha256(self.data).hexdigest())
+
+    def test_resumes_from_saved_offsets(self):
+        step = -(-len(self.data) // backup.DOWNLOAD_SEGMENTS)
+        segments = []
+        partial = bytearray(len(self.data))
+        for start in range(0, len(self.data), step):
+            end = min(start + step, len(self.data))
+            done = start + (end - start) // 3
+            partial[start:done] = self.data[start:done]
+            segments.append([start, end, done])
+        segments[-1][2] = segments[-1][1]  # One range already complete
+        partial[segments[-1][0]:] = self.data[segments[-1][0]:]
+        self.part_file.write_bytes(bytes(partial))
+        self.state_file.write_text(json.dumps({'size': len(self.data), 'segments': segments}))
+
+        self.assertEqual(self.download().status_code, 200)
+        self.assertEqual(self.dest.read_bytes(), self.data)
+        self.assertEqual(sorted(self.app.session.ranges),
+                         [(done, end) for _, end, done in segments[:-1]])
+        self.assertFalse(self.state_file.exists())
+
+    def test_state_for_other_size_starts_over(self):
+        self.part_file.write_bytes(b'\0' * 10)
+        self.state_file.write_text(json.dumps({'size': 10, 'segments': [[0, 10, 5]]}))
+
+        self.assertEqual(self.download().status_code, 200)
+        self.assertEqual(self.dest.read_bytes(), self.data)
+        self.assertEqual(min(start for start, _ in self.app.session.ranges), 0)
+        self.assertEqual(len(self.app.session.ranges), backup.DOWNLOAD_SEGMENTS)
+
+    def test_failure_keeps_resume_state(self):
+        session = self.app.session
+        real_get = session.get
+
+        def failing_get(url, headers=None, **kwargs):
+            if headers['Range'].startswith('bytes=0-'):
+                return RangeResponse(b'', 500)
+            return real_get(url, headers, **kwargs)
+
+        session.get = failing_get
+        self.assertIsNone(self.download())
+        self.assertFalse(self.dest.exists())
+        state = json.loads(self.state_file.read_text())
+        self.assertEqual(state['size'], len(self.data))
+        self.assertEqual(state['segments'][0][2], 0)
+        for start, end, done in state['segments']:
+            self.assertTrue(start <= done <= end)
+            self.assertEqual(self.part_file.read_bytes()[start:done], self.data[start:done])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import base64
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import onedrive_backup_enhanced as backup
+from onedrive_backup_enhanced import QuickXorHash
+
+
+def reference_quickxor(data):
+    """Byte-at-a-time quickXorHash, straight from the published algorithm"""
+    mask = (1 << 160) - 1
+    register = 0
+    for i, byte in enumerate(data):
+        shift = (i * 11) % 160
+        register ^= ((byte << shift) | (byte >> (160 - shift))) & mask
+    register ^= len(data) << 96
+    return base64.b64encode(register.to_bytes(20, 'little')).decode('ascii')
+
+
+class QuickXorHashTests(unittest.TestCase):
+    def test_known_vectors(self):
+        self.assertEqual(QuickXorHash().base64digest(), 'AAAAAAAAAAAAAAAAAAAAAAAAAAA=')
+        self.assertEqual(QuickXorHash(b'J').base64digest(), 'SgAAAAAAAAAAAAAAAQAAAAAAAAA=')
+
+    def test_matches_reference(self):
+        # Odd lengths around the 160-byte period and the BLOCK fold size
+        for size in (1, 7, 159, 160, 161, 319, 321, 1000, QuickXorHash.BLOCK - 1,
+                     QuickXorHash.BLOCK + 3, 2 * QuickXorHash.BLOCK + 161):
+            data = os.urandom(size)
+            self.assertEqual(QuickXorHash(data).base64digest(), reference_quickxor(data), size)
+
+    def test_split_updates(self):
+        data = os.urandom(3 * QuickXorHash.BLOCK + 77)
+        expected = reference_quickxor(data)
+        for cuts in ([1], [159, 160], [161, 5000, 5001], [QuickXorHash.BLOCK - 1, QuickXorHash.BLOCK + 1],
+                     list(range(0, len(data), 999))):
+            hasher = QuickXorHash()
+            start = 0
+            for end in cuts + [len(data)]:
+                hasher.update(data[start:end])
+                start = end
+            self.assertEqual(hasher.base64digest(), expected, cuts[:3])
+
+    def test_quickxor_file(self):
+        data = os.urandom(QuickXorHash.BLOCK * 2 + 333)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'file.bin'
+            path.write_bytes(data)
+            self.assertEqual(backup.quickxor_file(path), reference_quickxor(data))
+
+
+class HashFileTests(unittest.TestCase):
+    def test_hash_file(self):
+        import hashlib
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'file.bin'
+            data = os.urandom(3 * 1024 * 1024 + 5)
+            path.write_bytes(data)
+            self.assertEqual(backup.hash_file(path), hashlib.sha256(data).hexdigest())
+            self.assertEqual(backup.hash_file(path, algorithm='sha1'), hashlib.sha1(data).hexdigest())
+            path.write_bytes(b'')
+            self.assertEqual(backup.hash_file(path), hashlib.sha256(b'').hexdigest())
+
+    def test_hash_file_missing(self):
+        self.assertIsNone(backup.hash_file('/nonexistent/file.bin'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import onedrive_backup_enhanced as backup
+
+
+class NeedsCopyTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.src = Path(self._tmp.name) / 'src.bin'
+        self.dest = Path(self._tmp.name) / 'dest.bin'
+        self.src.write_bytes(b'x' * 100)
+        self.dest.write_bytes(b'x' * 100)
+        self.app = backup.OneDriveBackup()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def set_dest_mtime(self, offset):
+        src_mtime = os.stat(self.src).st_mtime
+        os.utime(self.dest, (src_mtime + offset, src_mtime + offset))
+
+    def test_missing_copy(self):
+        self.dest.unlink()
+        self.assertTrue(self.app._needs_copy(os.stat(self.src), self.dest))
+
+    def test_within_mtime_tolerance(self):
+        for offset in (0, 1, -1, backup.MTIME_TOLERANCE):
+            self.set_dest_mtime(offset)
+            self.assertFalse(self.app._needs_copy(os.stat(self.src), self.dest), offset)
+
+    def test_outside_mtime_tolerance(self):
+        for offset in (backup.MTIME_TOLERANCE + 1, -backup.MTIME_TOLERANCE - 1):
+            self.set_dest_mtime(offset)
+            self.assertTrue(self.app._needs_copy(os.stat(self.src), self.dest), offset)
+
+    def test_size_changed(self):
+        self.set_dest_mtime(0)
+        self.dest.write_bytes(b'x' * 99)
+        self.set_dest_mtime(0)
+        self.assertTrue(self.app._needs_copy(os.stat(self.src), self.dest))
+
+
+class CheckLocalFileTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / 'file.bin'
+        self.path.write_bytes(b'y' * 50)
+        self.app = backup.OneDriveBackup()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def record(self, **extra):
+        info = {'size': 50, 'hash': 'ab' * 32, 'hash_algo': 'sha256',
+                'mtime_ns': os.stat(self.path).st_mtime_ns}
+        info.update(extra)
+        self.app.file_metadata['id'] = info
+
+    def test_missing_file(self):
+        self.path.unlink()
+        self.assertIs(self.app._check_local_file('id', 50, self.path), True)
+
+    def test_no_metadata_trusts_matching_size(self):
+        self.assertIs(self.app._check_local_file('id', 50, self.path), False)
+
+    def test_no_metadata_size_mismatch_deletes(self):
+        self.assertIs(self.app._check_local_file('id', 51, self.path), True)
+        self.assertFalse(self.path.exists())
+
+    def test_unchanged_file_is_skipped(self):
+        self.record()
+        self.assertIs(self.app._check_local_file('id', 50, self.path), False)
+
+    def test_changed_mtime_needs_hash(self):
+        self.record(mtime_ns=1)
+        hash_func, expected = self.app._check_local_file('id', 50, self.path)
+        self.assertEqual(expected, 'ab' * 32)
+        self.assertEqual(hash_func(self.path), backup.hash_file(self.path))
+
+    def test_changed_mtime_prefers_server_hash(self):
+        self.record(mtime_ns=1, server_hash_type='quickXorHash', server_hash='qxh=')
+        hash_func, expected = self.app._check_local_file('id', 50, self.path)
+        self.assertIs(hash_func, backup.quickxor_file)
+        self.assertEqual(expected, 'qxh=')
+
+    def test_paranoid_always_hashes(self):
+        self.record()
+        self.app.paranoid = True
+        self.assertIsInstance(self.app._check_local_file('id', 50, self.path), tuple)
+
+    def test_changed_in_onedrive(self):
+        self.record(server_hash_type='quickXorHash', server_hash='old=')
+        self.assertIs(self.app._check_local_file('id', 50, self.path, ('quickXorHash', 'new=')), True)
+
+    def test_size_mismatch_deletes(self):
+        self.record(size=49)
+        self.assertIs(self.app._check_local_file('id', 50, self.path), True)
+        self.assertFalse(self.path.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import onedrive_backup_enhanced as backup
+
+
+def entry(size, file_hash='0' * 64):
+    return {'size': size, 'hash': file_hash, 'hash_algo': 'sha256', 'mtime_ns': 1}
+
+
+class MetadataJournalTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def reload(self):
+        fresh = backup.OneDriveBackup()
+        fresh.load_metadata(self.root)
+        return fresh
+
+    def test_changes_go_to_journal(self):
+        app = self.reload()
+        app._set_metadata('a', entry(10))
+        app._set_metadata('b', entry(20))
+        app.save_metadata()
+
+        self.assertFalse(app.metadata_file.exists())
+        self.assertEqual(len(app.metadata_journal.read_bytes().splitlines()), 2)
+        self.assertEqual(self.reload().file_metadata, {'a': entry(10), 'b': entry(20)})
+
+    def test_round_trip_with_updates_and_drops(self):
+        app = self.reload()
+        app._set_metadata('a', entry(10))
+        app._set_metadata('b', entry(20))
+        app.save_metadata(compact=True)
+        app._set_metadata('a', entry(11, 'f' * 64))
+        app._drop_metadata('b')
+        app._set_metadata('c', entry(30))
+        app.save_metadata()
+
+        loaded = self.reload()
+        self.assertEqual(loaded.file_metadata, {'a': entry(11, 'f' * 64), 'c': entry(30)})
+        self.assertEqual(loaded.journal_entries, 3)
+
+    def test_compact(self):
+        app = self.reload()
+        app._set_metadata('a', entry(10))
+        app.save_metadata()
+        app._drop_metadata('a')
+        app._set_metadata('b', entry(20))
+        app.save_metadata(compact=True)
+
+        self.assertTrue(app.metadata_file.exists())
+        self.assertFalse(app.metadata_journal.exists())
+        self.assertEqual(app.journal_entries, 0)
+        self.assertEqual(self.reload().file_metadata, {'b': entry(20)})
+
+    def test_compacts_after_enough_entries(self):
+        app = self.reload()
+        with mock.patch.object(backup, 'METADATA_COMPACT_EVERY', 3):
+            app._set_metadata('a', entry(10))
+            app._set_metadata('b', entry(20))
+            app.save_metadata()
+            self.assertFalse(app.metadata_file.exists())
+            app._set_metadata('c', entry(30))
+            app.save_metadata()
+
+        self.assertTrue(app.metadata_file.exists())
+        self.assertFalse(app.metadata_journal.exists())
+        self.assertEqual(len(self.reload().file_metadata), 3)
+
+    def test_torn_last_line_and_zero_byte_entries(self):
+        app = self.reload()
+        app._set_metadata('a', entry(10))
+        app._set_metadata('empty', entry(0))
+        app.save_metadata()
+        with open(app.metadata_journal, 'ab') as f:
+            f.write(b'["b", {"size": 2')  # Interrupted mid-write
+
+        self.assertEqual(self.reload().file_metadata, {'a': entry(10)})
+
+
+if __name__ == '__main__':
+    unittest.main()